@@ -1,41 +1,257 @@
-import json
+import os
 import time
-from typing import Optional
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
 from solana.rpc.api import Client
+import repo_paths  # noqa: F401 (shared helpers in "web3 tests")
 from analyzer import SolanaProgramAnalyzer
-from db_setup import SolanaProgramDB
+from db_setup import SolanaProgramDB, split_range
+from rate_limiter import configure_endpoint, get_rate_limiter
+from block_cache import BlockCache
+from block_fetcher import BlockFetcher
+from fetch_profiles import resolve_profile
+from instruction_decoder import decode_block
+from windows import WindowedCounts
+from fee_analytics import FeeAnalyzer
+
+# getBlocks rejects ranges wider than this
+MAX_GET_BLOCKS_RANGE = 500_000
+
+# Progress gaps wider than this on resume are ranges the job never tailed, not failed fetches
+MAX_RETRY_GAP = 64
+
+def merge_deltas(pending: List[Tuple[list, dict]]) -> Tuple[dict, list]:
+    """Sum the take_deltas() results of several blocks and collect their slot ranges"""
+    merged = {}
+    completed = []
+    for ranges, deltas in pending:
+        completed.extend(ranges)
+        for program_id, (count, instructions) in deltas.items():
+            total, names = merged.get(program_id, (0, Counter()))
+            names.update(instructions)
+            merged[program_id] = (total + count, names)
+    return merged, completed
 
 class ContinuousBlockAnalyzer:
-    def __init__(self, http_url: str, db_path: str = 'solana_programs.db'):
+    def __init__(self, http_url: str, db_path: str = 'solana_programs.db', concurrency: int = 8,
+                 cache: Optional[BlockCache] = None, flush_blocks: int = 10, flush_interval: float = 5.0,
+                 snapshot_path: Optional[str] = None, snapshot_interval: float = 60.0):
         self.client = Client(http_url)
-        self.program_analyzer = SolanaProgramAnalyzer()
+        # Keeps last 1m / 10m / 1h (and slot-based) top programs alongside the lifetime counts,
+        # plus the changes since the last database flush
+        self.program_analyzer = SolanaProgramAnalyzer(windows=WindowedCounts(), track_deltas=True)
+        # Priority fee quantiles per block, program and rolling window, for pricing our own transactions
+        self.fee_analyzer = FeeAnalyzer()
         self.db = SolanaProgramDB(db_path)
+        self.rate_limiter = get_rate_limiter(http_url)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.last_processed_slot = None
+        self.skipped_slots = 0
+        self.failed_slots = 0
+        # Confirmed slots whose block could not be fetched yet, with the attempts so far; they are
+        # kept out of the progress log and retried by tail_blocks until fetched or given up on
+        self.unfetched_slots = {}
+        self.cache = cache
+
+        # Database writes are batched: flushed after flush_blocks blocks or flush_interval seconds,
+        # whichever comes first, together with the slot ranges the flushed blocks complete
+        self.flush_blocks = flush_blocks
+        self.flush_interval = flush_interval
+        self.pending_blocks = 0
+        self.pending_job = None
+        self.pending_ranges = []
+        # (ranges, program deltas) of each pending block, so a rejected flush can drop single blocks
+        self.pending_deltas = []
+        self.last_flush = time.monotonic()
+
+        # The analyzer's in-memory state is snapshotted after a flush at most every snapshot_interval
+        # seconds and on exit, so a restart doesn't start its totals from zero. After a crash the
+        # database stays exact, but the totals miss blocks flushed after the last snapshot.
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.last_snapshot = time.monotonic()
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.program_analyzer.restore(snapshot_path)
+            print(f"Restored analyzer state from {snapshot_path} "
+                  f"({self.program_analyzer.transactions_analyzed} transactions)")
+
+        # Blocks are fetched as raw JSON and decoded once, straight into the dicts the analyzer reads;
+        # the request asks for no more than the attached analyzers need
+        self.profile = resolve_profile(self.program_analyzer, self.fee_analyzer)
+        self.fetcher = BlockFetcher(http_url, concurrency=concurrency, block_config=self.profile.block_config,
+                                    cache=cache)
         
-    def get_block_data(self, slot: int) -> Optional[dict]:
-        """Fetch block data for a specific slot"""
+    def rpc_call(self, method: str, call, *args, **kwargs):
+        """Run a client call through the shared endpoint rate limiter"""
+        self.rate_limiter.acquire(method)
         try:
-            block = self.client.get_block(
-                slot,
-                encoding="jsonParsed",
-                max_supported_transaction_version=0,
-            )
-            return block.value if block and block.value else None
+            result = call(*args, **kwargs)
         except Exception as e:
-            print(f"Error fetching block {slot}: {e}")
-            return None
+            if "429" in str(e) or "-32005" in str(e):
+                self.rate_limiter.on_throttled()
+            raise
+        self.rate_limiter.on_success()
+        return result
+
+    def get_slot(self) -> int:
+        """Fetch the current slot"""
+        return self.rpc_call("getSlot", self.client.get_slot).value
+
+    def get_block_data(self, slot: int) -> Optional[dict]:
+        """Fetch block data for a specific slot"""
+        response = self.fetcher.fetch_block_sync(slot)
+        if response and response.get("error"):
+            print(f"Error fetching block {slot}: {response['error']}")
+        block = response.get("result") if response else None
+        # Wire-encoded transactions are decoded here, on the fetch threads
+        return decode_block(block) if block else None
+
+    def get_confirmed_slots(self, start_slot: int, end_slot: int) -> List[int]:
+        """List the slots in [start_slot, end_slot] that produced a block"""
+        return self.rpc_call("getBlocks", self.client.get_blocks, start_slot, end_slot).value
+
+    def fetch_blocks(self, slots: List[int]) -> List[Optional[dict]]:
+        """Fetch several blocks concurrently, returned in the same order as slots"""
+        return list(self.executor.map(self.get_block_data, slots))
+
+    def retry_unfetched(self, max_attempts: int) -> Iterator[Tuple[int, object]]:
+        """Fetch the queued unfetched slots again, yielding (slot, block_data) for each one that arrives"""
+        slots = sorted(self.unfetched_slots)
+        for slot, block_data in zip(slots, self.fetch_blocks(slots)):
+            if block_data is not None:
+                del self.unfetched_slots[slot]
+                yield slot, block_data
+                continue
+            self.unfetched_slots[slot] += 1
+            if self.unfetched_slots[slot] >= max_attempts:
+                # Left as a gap in the progress log, so the next resume tries it again
+                del self.unfetched_slots[slot]
+                self.failed_slots += 1
+                print(f"Giving up on confirmed block at slot {slot} after {max_attempts} attempts")
+
+    def tail_blocks(self, max_slots_per_batch: int = 64, poll_interval: float = 0.4,
+                    max_attempts: int = 5) -> Iterator[Tuple[int, object]]:
+        """
+        Yield (slot, block_data) for every confirmed block after the cursor, forever.
+
+        Slots between the cursor and the tip that have no block are counted as
+        skipped. While behind the tip, batches are fetched back to back; the
+        loop only sleeps once it has caught up. Confirmed blocks that fail to
+        fetch are retried on every pass, up to max_attempts times, and yielded
+        late (below the cursor) when they arrive.
+        """
+        if self.last_processed_slot is None:
+            self.last_processed_slot = self.get_slot() - 1
+
+        while True:
+            if self.unfetched_slots:
+                yield from self.retry_unfetched(max_attempts)
+
+            tip = self.get_slot()
+            if tip <= self.last_processed_slot:
+                time.sleep(poll_interval)
+                continue
+
+            start_slot = self.last_processed_slot + 1
+            end_slot = min(tip, start_slot + min(max_slots_per_batch, MAX_GET_BLOCKS_RANGE) - 1)
+            slots = self.get_confirmed_slots(start_slot, end_slot)
+            self.skipped_slots += (end_slot - start_slot + 1) - len(slots)
+
+            # The consumer advances the cursor once it has analyzed a yielded block
+            for slot, block_data in zip(slots, self.fetch_blocks(slots)):
+                if block_data is None:
+                    self.unfetched_slots[slot] = 1
+                    self.last_processed_slot = slot
+                    print(f"Could not fetch confirmed block at slot {slot}, will retry")
+                else:
+                    yield slot, block_data
+
+            self.last_processed_slot = end_slot
+
+    def analyze_block(self, block_data, slot_range: Optional[Tuple[int, int]] = None, job: str = 'tail') -> bool:
+        """
+        Analyze a block and queue its program counts for the next database flush
 
-    def analyze_block(self, block_data) -> None:
-        """Analyze a block and update database"""
+        Args:
+            block_data (dict): Decoded block
+            slot_range (tuple): (start_slot, end_slot) this block completes, including the
+                skipped slots before it; recorded in the progress log when its stats are flushed
+            job (str): Progress log job name
 
-        # Analyze transactions in the block
-        for tx in block_data.transactions:
-            tx_json = json.loads(tx.to_json())
-            self.program_analyzer.analyze_transaction(tx_json)
+        Returns:
+            bool: False if the slot range was already recorded and the block was not applied
+        """
+        completed = split_range(*slot_range, self.unfetched_slots) if slot_range else []
+        if completed and any(self.db.progress.overlaps(job, start, end) for start, end in completed):
+            return False
+        if job == self.pending_job and any(start <= pending_end and end >= pending_start
+                                           for start, end in completed
+                                           for pending_start, pending_end in self.pending_ranges):
+            return False
+        if completed and self.pending_job not in (None, job):
+            self.flush()
 
-        # Update database with new program data
-        for program_id, instructions in self.program_analyzer.program_instructions.items():
-            if program_id not in self.program_analyzer.UTILITY_PROGRAMS:
-                self.db.update_program_stats(program_id, instructions, self.program_analyzer.program_counts[program_id])
+        # Analyze all transactions in the block at once
+        slot = slot_range[1] if slot_range else None
+        self.program_analyzer.analyze_block(block_data, slot)
+        self.fee_analyzer.analyze_block(block_data, slot)
+
+        if completed:
+            self.pending_job = job
+            self.pending_ranges.extend(completed)
+            self.pending_deltas.append((completed, self.program_analyzer.take_deltas()))
+        self.pending_blocks += 1
+        if self.pending_blocks >= self.flush_blocks or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+        return True
+
+    def flush(self) -> bool:
+        """
+        Write the program counts accumulated since the last flush in one transaction
+
+        The slot ranges of the flushed blocks are recorded in the same transaction,
+        so after a crash the progress log resumes exactly where the counts stop.
+        If another writer recorded some of the ranges meanwhile, only the blocks
+        covering them are dropped and the rest is written.
+
+        Returns:
+            bool: False if some blocks were dropped because their ranges had been recorded
+        """
+        pending = self.pending_deltas
+        untracked = self.program_analyzer.take_deltas()
+        if untracked:
+            # Blocks analyzed without a slot range
+            pending.append(([], untracked))
+        job = self.pending_job
+        self.pending_blocks = 0
+        self.pending_job = None
+        self.pending_ranges = []
+        self.pending_deltas = []
+        self.last_flush = time.monotonic()
+        if not pending:
+            return True
+
+        applied = True
+        while pending:
+            program_stats, completed = merge_deltas(pending)
+            if self.db.update_program_stats_batch(program_stats, job, completed):
+                break
+            applied = False
+            kept = [(ranges, deltas) for ranges, deltas in pending
+                    if not any(self.db.progress.overlaps(job, start, end) for start, end in ranges)]
+            if len(kept) == len(pending):
+                break
+            pending = kept
+        if self.snapshot_path and time.monotonic() - self.last_snapshot >= self.snapshot_interval:
+            self.save_snapshot()
+        return applied
+
+    def save_snapshot(self):
+        """Snapshot the analyzer's state; call after flush() so it matches the database"""
+        if self.snapshot_path:
+            self.program_analyzer.snapshot(self.snapshot_path)
+            self.last_snapshot = time.monotonic()
 
     def print_current_stats(self):
         """Print current analysis stats"""
@@ -43,6 +259,18 @@ class ContinuousBlockAnalyzer:
         print("\nCurrent Analysis Summary:")
         print(f"Total Transactions: {stats['total_transactions']}")
         print(f"Unique Programs: {stats['unique_programs']}")
+
+        for window in ('1m', '10m', '1h'):
+            top = self.program_analyzer.get_windowed_top_programs(window, 5)
+            if top:
+                print(f"\nTop Programs, last {window}:")
+                for program_id, calls in top:
+                    print(f"{program_id}: {calls} calls")
+
+        fees = self.fee_analyzer.price_quantiles('1m')
+        if fees:
+            print("\nCompute Unit Price, last 1m (micro-lamports/CU): "
+                  + ", ".join(f"{name}={price:,.0f}" for name, price in fees.items()))
         
         print("\nTop 10 Programs from Database:")
         top_programs = self.db.get_top_programs(10)
@@ -56,41 +284,70 @@ class ContinuousBlockAnalyzer:
             if instructions:
                 print("Instructions:", ", ".join(f"{name}({calls} calls)" for name, calls in instructions))
 
-def run_continuous_analysis(http_url: str, num_blocks: int, delay: float = 0.5):
+def run_continuous_analysis(http_url: str, num_blocks: int, requests_per_second: float = 4,
+                            credits_per_second: Optional[float] = None, start_slot: Optional[int] = None,
+                            concurrency: int = 8, cache_dir: Optional[str] = None, job: str = 'tail',
+                            snapshot_path: Optional[str] = None):
     """
     Run continuous analysis for specified number of blocks
+
+    Without a start_slot, the tail resumes after the last slot the job recorded
+    in the progress log; stats and slot ranges are flushed together in batches.
     
     Args:
         http_url (str): RPC endpoint URL
         num_blocks (int): Number of blocks to analyze
-        delay (float): Delay between block analysis in seconds
+        requests_per_second (float): Request budget for the endpoint
+        credits_per_second (float): Optional credit budget for the endpoint
+        start_slot (int): Slot to start tailing from (defaults to the current tip)
+        concurrency (int): Number of blocks fetched in parallel
+        cache_dir (str): Optional block cache directory, so later runs can replay these blocks
+        job (str): Progress log job name
+        snapshot_path (str): Optional analyzer state snapshot to restore from and save to
     """
-    analyzer = ContinuousBlockAnalyzer(http_url)
+    configure_endpoint(http_url, requests_per_second, credits_per_second)
+    cache = BlockCache(cache_dir) if cache_dir else None
+    analyzer = ContinuousBlockAnalyzer(http_url, concurrency=concurrency, cache=cache, snapshot_path=snapshot_path)
+    if start_slot is not None:
+        analyzer.last_processed_slot = start_slot - 1
+    else:
+        resume_slot = analyzer.db.progress.last_completed_slot(job)
+        if resume_slot is not None:
+            print(f"Resuming {job} after slot {resume_slot}")
+            analyzer.last_processed_slot = resume_slot
+            # Blocks an earlier run could not fetch are the gaps in its progress; retry them too
+            for gap_start, gap_end in analyzer.db.progress.gaps(job):
+                if gap_end - gap_start < MAX_RETRY_GAP:
+                    confirmed = analyzer.get_confirmed_slots(gap_start, gap_end)
+                    analyzer.unfetched_slots.update(dict.fromkeys(confirmed, 0))
+    committed_slot = analyzer.last_processed_slot
     blocks_analyzed = 0
     
     print(f"Starting analysis of {num_blocks} blocks...")
     
     try:
-        while blocks_analyzed < num_blocks:
-            # Get current slot
-            slot_response = analyzer.client.get_slot()
-            current_slot = slot_response.value
+        for slot, block_data in analyzer.tail_blocks():
+            print(f"\nAnalyzing block at slot: {slot}")
+            if committed_slot is not None and slot <= committed_slot:
+                # A retried block fills the gap it left behind the cursor
+                applied = analyzer.analyze_block(block_data, (slot, slot), job)
+            else:
+                # The block also completes the skipped slots between it and the last committed one
+                range_start = committed_slot + 1 if committed_slot is not None else slot
+                applied = analyzer.analyze_block(block_data, (range_start, slot), job)
+                analyzer.last_processed_slot = committed_slot = slot
+            if not applied:
+                print(f"Slot {slot} was already recorded for {job}, skipping")
+                continue
+            blocks_analyzed += 1
+            print(f"Analyzed {blocks_analyzed}/{num_blocks} blocks ({analyzer.skipped_slots} skipped slots)")
             
-            # Get and analyze block
-            print(f"\nAnalyzing block at slot: {current_slot}")
-            block_data = analyzer.get_block_data(current_slot)
+            # Print stats every 5 blocks or at the end
+            if blocks_analyzed % 5 == 0 or blocks_analyzed == num_blocks:
+                analyzer.print_current_stats()
             
-            if block_data:
-                analyzer.analyze_block(block_data)
-                blocks_analyzed += 1
-                print(f"Analyzed {blocks_analyzed}/{num_blocks} blocks")
-                
-                # Print stats every 5 blocks or at the end
-                if blocks_analyzed % 5 == 0 or blocks_analyzed == num_blocks:
-                    analyzer.print_current_stats()
-            
-            # Wait before next block
-            time.sleep(delay)
+            if blocks_analyzed >= num_blocks:
+                break
             
     except KeyboardInterrupt:
         print("\nAnalysis interrupted by user")
@@ -99,18 +356,62 @@ def run_continuous_analysis(http_url: str, num_blocks: int, delay: float = 0.5):
         import traceback
         traceback.print_exc()
     finally:
+        analyzer.flush()
+        analyzer.save_snapshot()
         print("\nFinal Statistics:")
         analyzer.print_current_stats()
 
+def run_replay_analysis(cache_dir: str, start_slot: int = 0, end_slot: Optional[int] = None,
+                        db_path: str = 'solana_programs.db', job: str = 'replay'):
+    """
+    Run the analyzer over cached blocks at disk speed, without any RPC calls
+
+    Every replayed slot is recorded under the job, and slots that any job
+    (tail, backfill or an earlier replay) has already recorded in the
+    database are skipped, so no block is counted into it twice.
+    
+    Args:
+        cache_dir (str): Block cache directory populated by earlier runs
+        start_slot (int): First slot to replay
+        end_slot (int): Last slot to replay (defaults to the newest cached block)
+        db_path (str): Program database to update
+        job (str): Progress log job name
+    """
+    cache = BlockCache(cache_dir)
+    analyzer = ContinuousBlockAnalyzer("http://localhost:8899", db_path=db_path, cache=cache)
+    blocks_analyzed = already_recorded = 0
+    
+    try:
+        for slot in cache.slots(analyzer.fetcher.cache_key, start_slot, end_slot):
+            if analyzer.db.progress.overlaps(None, slot, slot):
+                already_recorded += 1
+                continue
+            block_data = analyzer.get_block_data(slot)
+            if not block_data:
+                continue
+            if analyzer.analyze_block(block_data, (slot, slot), job):
+                blocks_analyzed += 1
+            else:
+                already_recorded += 1
+    except KeyboardInterrupt:
+        print("\nReplay interrupted by user")
+    finally:
+        analyzer.flush()
+        print(f"\nReplayed {blocks_analyzed} cached blocks")
+        if already_recorded:
+            print(f"Skipped {already_recorded} blocks already recorded in {db_path}")
+        analyzer.print_current_stats()
+        cache.close()
+
 if __name__ == "__main__":
     # Configuration
     QUICKNODE_HTTP_URL = "https://dimensional-omniscient-needle.solana-mainnet.quiknode.pro/b673c5969121edb8f0170e0025333ad090bc12b3"
     NUM_BLOCKS_TO_ANALYZE = 100  # Adjust as needed
-    DELAY_BETWEEN_BLOCKS = 1  # Adjust based on rate limits
+    REQUESTS_PER_SECOND = 4  # Adjust based on your plan's rate limits
     
     # Run analysis
     run_continuous_analysis(
         http_url=QUICKNODE_HTTP_URL,
         num_blocks=NUM_BLOCKS_TO_ANALYZE,
-        delay=DELAY_BETWEEN_BLOCKS
+        requests_per_second=REQUESTS_PER_SECOND
     )
\ No newline at end of file
@@ -1,9 +1,21 @@
-import json
 from collections import Counter, defaultdict
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
 from solana.rpc.api import Client
+import repo_paths  # noqa: F401 (shared helpers in "web3 tests")
+from block_fetcher import fetch_block_json
+from fetch_profiles import resolve_profile
+from instruction_decoder import decode_block
+from fast_json import transaction_json
+from log_interpreter import interpret_logs
+from windows import CountIndex, WindowedCounts
+from sketches import AnalyzerSketches
+from block_columns import BlockColumns
+from analyzer_state import AnalyzerState
 
 class SolanaProgramAnalyzer:
+    # Block fields analyze_transaction reads (see fetch_profiles)
+    REQUIRED_FIELDS = {'decodedInstructions', 'logs'}
+
     # Common utility programs we might want to filter out
     UTILITY_PROGRAMS = {
         'ComputeBudget111111111111111111111111111111',
@@ -14,85 +26,328 @@ class SolanaProgramAnalyzer:
         
     }
     
-    def __init__(self):
-        self.program_counts = Counter()
-        self.program_instructions = {}  # Maps programs to their instruction names
-        self.transactions_analyzed = 0
+    def __init__(self, windows: Optional[WindowedCounts] = None, sketches: Optional[AnalyzerSketches] = None,
+                 exact_counts: bool = True, track_deltas: bool = False):
+        """
+        Args:
+            windows (WindowedCounts): Optional trailing time/slot windows of program and instruction counts
+            sketches (AnalyzerSketches): Optional fixed-memory top-K, per-account, per-signer and
+                distinct-signer counters
+            exact_counts (bool): Keep exact per-program, per-instruction, call edge and depth counters;
+                with sketches attached this can be turned off so memory stays bounded however long
+                the process runs
+            track_deltas (bool): Also count into per-flush accumulators that take_deltas() hands
+                out and resets, so a database only ever receives what changed since the last flush
+        """
+        if not exact_counts and sketches is None:
+            raise ValueError("exact_counts=False needs sketches to count into")
+        # All cumulative counts live in the state, which merges, serializes and snapshots
+        self.state = AnalyzerState(sketches)
+        self.exact_counts = exact_counts
+        # Same counts ordered by count, so top programs don't need a sort
+        self.program_index = CountIndex()
+        self.windows = windows
+        self._slot = self._block_time = None
+        # Changes since the last take_deltas(), when tracking them
+        self.track_deltas = track_deltas
+        self.delta_counts = Counter()
+        self.delta_instructions = defaultdict(Counter)
         
-    def analyze_transaction(self, transaction_data: dict) -> None:
-        """Analyze a single transaction for program IDs and their instructions."""
+    @property
+    def program_counts(self) -> Counter:
+        return self.state.program_counts
+
+    @property
+    def program_instructions(self) -> defaultdict:
+        return self.state.program_instructions
+
+    @property
+    def call_edges(self) -> Counter:
+        return self.state.call_edges
+
+    @property
+    def depth_counts(self) -> Counter:
+        return self.state.depth_counts
+
+    @property
+    def sketches(self) -> Optional[AnalyzerSketches]:
+        return self.state.sketches
+
+    @property
+    def transactions_analyzed(self) -> int:
+        return self.state.transactions
+
+    @transactions_analyzed.setter
+    def transactions_analyzed(self, value: int):
+        self.state.transactions = value
+
+    def analyze_transaction(self, transaction_data: dict, slot: Optional[int] = None,
+                            block_time: Optional[float] = None) -> None:
+        """Analyze a single transaction for program IDs and their instructions.
+
+        slot and block_time place the transaction in the sliding windows, if any;
+        block_time falls back to the transaction's own blockTime, then the wall clock.
+        """
         self.transactions_analyzed += 1
-        
-        self.instruction_counts = defaultdict(lambda: defaultdict(int))
+        self._slot = slot if slot is not None else transaction_data.get('slot')
+        self._block_time = block_time if block_time is not None else transaction_data.get('blockTime')
         
         # Get instructions from the transaction
         try:
             instructions = transaction_data.get('transaction', {}).get('message', {}).get('instructions', [])
+            meta = transaction_data.get('meta') or {}
+            programs = set()
+            inner_by_index = {
+                inner.get('index'): inner.get('instructions') or []
+                for inner in meta.get('innerInstructions') or []
+            }
             
-            # Count program occurrences and collect instruction data
-            for instruction in instructions:
+            # Count program occurrences and collect instruction data, following each
+            # top-level instruction straight into the inner instructions it invoked
+            for index, instruction in enumerate(instructions):
                 program_id = instruction.get('programId')
-                if program_id:
-                    self.program_counts[program_id] += 1
-                    
-                    # Initialize program instructions list if needed
-                    if program_id not in self.program_instructions:
-                        self.program_instructions[program_id] = []
-                    
-                    # Extract instruction type
-                    instruction_type = None
-                    if isinstance(instruction.get('parsed'), str):
-                        instruction_type = instruction['parsed']
-                    elif isinstance(instruction.get('parsed'), dict):
-                        instruction_type = instruction['parsed'].get('type')
-                    
-                    # Store instruction type if we found one
-                    if instruction_type and instruction_type not in self.program_instructions[program_id]:
-                        self.program_instructions[program_id].append(instruction_type)
+                if not program_id:
+                    continue
+                self.count_instruction(program_id, instruction, 1)
+                programs.add(program_id)
+
+                # stackHeight gives each inner instruction's depth; its caller is the
+                # closest shallower invocation still on the stack
+                stack = [program_id]
+                for inner in inner_by_index.get(index, ()):
+                    inner_program = inner.get('programId')
+                    if not inner_program:
+                        continue
+                    depth = inner.get('stackHeight') or 2
+                    del stack[depth - 1:]
+                    edge = (stack[-1] if stack else program_id, inner_program)
+                    if self.exact_counts:
+                        self.call_edges[edge] += 1
+                    if self.sketches:
+                        self.sketches.add_call_edge(edge)
+                    stack.append(inner_program)
+                    self.count_instruction(inner_program, inner, depth)
+                    programs.add(inner_program)
                         
-            # Also check log messages for instruction types
-            if 'meta' in transaction_data and 'logMessages' in transaction_data['meta']:
-                for log in transaction_data['meta']['logMessages']:
-                    if 'Instruction:' in log:
-                        instruction_name = log.split('Instruction:')[1].strip()
-                        for program_id in self.program_counts:
-                            if instruction_name not in self.program_instructions[program_id]:
-                                self.program_instructions[program_id].append(instruction_name)
+            # Attribute logged instruction names to the program that was executing when it logged them
+            for invocation in interpret_logs(meta.get('logMessages')):
+                if invocation.instructions:
+                    if self.exact_counts:
+                        self.program_instructions[invocation.program_id].update(invocation.instructions)
+                    if self.track_deltas:
+                        self.delta_instructions[invocation.program_id].update(invocation.instructions)
+                    if self.sketches:
+                        for name in invocation.instructions:
+                            self.sketches.add_instruction(invocation.program_id, name)
+                    if self.windows:
+                        for name in invocation.instructions:
+                            self.windows.observe_instruction(invocation.program_id, name, self._slot,
+                                                             self._block_time)
+
+            if self.sketches:
+                accounts, signers = self.transaction_accounts(transaction_data)
+                self.sketches.add_transaction(programs, accounts, signers)
                     
         except Exception as e:
             print(f"Error analyzing transaction: {str(e)}")
     
+    def count_instruction(self, program_id: str, instruction, depth: int) -> None:
+        """Count one top-level or inner instruction for its program."""
+        if self.exact_counts:
+            self.depth_counts[depth] += 1
+        if self.sketches:
+            self.sketches.add_depth(depth)
+
+        # Extract instruction type
+        parsed = instruction.get('parsed')
+        instruction_type = parsed if isinstance(parsed, str) else parsed.get('type') if parsed else None
+        if self.exact_counts:
+            self.program_counts[program_id] += 1
+            self.program_index.add(program_id)
+            names = self.program_instructions[program_id]
+            if instruction_type:
+                names[instruction_type] += 1
+        if self.track_deltas:
+            self.delta_counts[program_id] += 1
+            if instruction_type:
+                self.delta_instructions[program_id][instruction_type] += 1
+        if self.sketches:
+            self.sketches.add_program(program_id, instruction_type)
+        if self.windows:
+            self.windows.observe(program_id, instruction_type, self._slot, self._block_time)
+
+    def analyze_block(self, block_data: dict, slot: Optional[int] = None,
+                      block_time: Optional[float] = None) -> BlockColumns:
+        """
+        Analyze every transaction of a decoded block at once
+
+        Counts the same things as calling analyze_transaction on each transaction,
+        but from the block's columns: each program, instruction, depth and call
+        edge is counted once per block with vectorized group-bys instead of once
+        per instruction.
+
+        Returns:
+            BlockColumns: The block's columns, for fee, failure and compute unit breakdowns
+        """
+        columns = BlockColumns.from_block(block_data)
+        block_time = block_time if block_time is not None else block_data.get('blockTime')
+        self.transactions_analyzed += columns.transaction_count
+
+        program_counts = columns.program_counts()
+        instruction_counts = columns.instruction_counts()
+        depth_counts = columns.depth_counts()
+        call_edges = columns.call_edges()
+
+        if self.exact_counts:
+            self.depth_counts.update(depth_counts)
+            self.call_edges.update(call_edges)
+            self.program_counts.update(program_counts)
+            for program_id, count in program_counts.items():
+                self.program_index.add(program_id, count)
+            for (program_id, name), count in instruction_counts.items():
+                self.program_instructions[program_id][name] += count
+        if self.track_deltas:
+            self.delta_counts.update(program_counts)
+            for (program_id, name), count in instruction_counts.items():
+                self.delta_instructions[program_id][name] += count
+        if self.windows:
+            for program_id, count in program_counts.items():
+                self.windows.observe(program_id, None, slot, block_time, count)
+            for (program_id, name), count in instruction_counts.items():
+                self.windows.observe_instruction(program_id, name, slot, block_time, count)
+        if self.sketches:
+            for program_id, count in program_counts.items():
+                self.sketches.add_program(program_id, None, count)
+            for (program_id, name), count in instruction_counts.items():
+                self.sketches.add_instruction(program_id, name, count)
+            for depth, count in depth_counts.items():
+                self.sketches.add_depth(depth, count)
+            for edge, count in call_edges.items():
+                self.sketches.add_call_edge(edge, count)
+            # Accounts and signers are per transaction; programs come from the instruction rows
+            tx_programs = defaultdict(set)
+            for row, code in zip(columns.ix_tx.tolist(), columns.ix_program.tolist()):
+                tx_programs[row].add(columns.programs[code])
+            for row, tx in enumerate(block_data.get('transactions') or ()):
+                accounts, signers = self.transaction_accounts(tx)
+                self.sketches.add_transaction(tx_programs.get(row, ()), accounts, signers)
+        return columns
+
+    def take_deltas(self, exclude_utility: bool = True) -> Dict[str, tuple]:
+        """
+        Hand out the changes since the last call and start accumulating afresh
+
+        Returns:
+            dict: program_id -> (call_count, {instruction_name: count}), the shape
+                SolanaProgramDB.update_program_stats_batch takes
+        """
+        deltas = {
+            program_id: (count, dict(self.delta_instructions.get(program_id, {})))
+            for program_id, count in self.delta_counts.items()
+            if not (exclude_utility and program_id in self.UTILITY_PROGRAMS)
+        }
+        self.delta_counts = Counter()
+        self.delta_instructions = defaultdict(Counter)
+        return deltas
+
+    @staticmethod
+    def transaction_accounts(transaction_data: dict) -> tuple:
+        """Return a transaction's account keys and its signers."""
+        message = transaction_data.get('transaction', {}).get('message', {})
+        account_keys = message.get('accountKeys') or []
+        accounts = [key.get('pubkey') if isinstance(key, dict) else key for key in account_keys]
+        if account_keys and isinstance(account_keys[0], dict):
+            signers = [key.get('pubkey') for key in account_keys if key.get('signer')]
+        else:
+            signers = accounts[:(message.get('header') or {}).get('numRequiredSignatures', 1)]
+        return accounts, signers
+
     def get_top_programs(self, n: int = 10, exclude_utility: bool = True) -> List[tuple]:
         """Get the top N most frequently occurring programs."""
-        if exclude_utility:
-            filtered_counts = {
-                prog: count for prog, count 
-                in self.program_counts.items() 
-                if prog not in self.UTILITY_PROGRAMS
-            }
-            return Counter(filtered_counts).most_common(n)
-        return self.program_counts.most_common(n)
+        exclude = self.UTILITY_PROGRAMS if exclude_utility else ()
+        if not self.exact_counts:
+            return self.sketches.programs.top(n, exclude)
+        return self.program_index.top(n, exclude)
+
+    def get_windowed_top_programs(self, window: str, n: int = 10, exclude_utility: bool = True) -> List[tuple]:
+        """Get the top N programs over a trailing window such as '1m', '10m', '1h' or '150 slots'."""
+        if not self.windows:
+            raise ValueError("Analyzer was created without sliding windows")
+        return self.windows.top_programs(window, n, self.UTILITY_PROGRAMS if exclude_utility else ())
+
+    def get_windowed_top_instructions(self, window: str, n: int = 10) -> List[tuple]:
+        """Get the top N (program, instruction) pairs over a trailing window."""
+        if not self.windows:
+            raise ValueError("Analyzer was created without sliding windows")
+        return self.windows.top_instructions(window, n)
     
     def get_program_stats(self) -> Dict:
         """Get statistical information about analyzed programs."""
+        depth_counts = self.depth_counts if self.exact_counts else dict(self.sketches.depths.items())
+        depth_stats = {
+            'inner_instructions': sum(count for depth, count in depth_counts.items() if depth > 1),
+            'max_depth': max(depth_counts, default=0),
+        }
+        if not self.exact_counts:
+            # Sketches only know the programs they still track
+            return {
+                'total_transactions': self.transactions_analyzed,
+                'unique_programs': len(self.sketches.programs),
+                'total_program_calls': self.sketches.programs.total,
+                'programs_with_instructions': len({pid for pid, _ in self.sketches.instructions.counts.counts}),
+                **depth_stats,
+            }
         return {
             'total_transactions': self.transactions_analyzed,
             'unique_programs': len(self.program_counts),
             'total_program_calls': sum(self.program_counts.values()),
-            'programs_with_instructions': len([p for p in self.program_instructions if self.program_instructions[p]])
+            'programs_with_instructions': len([p for p in self.program_instructions if self.program_instructions[p]]),
+            **depth_stats,
         }
+
+    def get_top_call_edges(self, n: int = 10, exclude_utility: bool = True) -> List[tuple]:
+        """Get the top N caller -> callee program pairs by number of cross-program invocations."""
+        edges = self.call_edges if self.exact_counts else Counter(dict(self.sketches.call_edges.items()))
+        if exclude_utility:
+            edges = Counter({edge: count for edge, count in edges.items() if edge[1] not in self.UTILITY_PROGRAMS})
+        return edges.most_common(n)
     
     def get_program_instructions(self, program_id: str) -> List[str]:
-        """Get all unique instructions seen for a specific program."""
-        return self.program_instructions.get(program_id, [])
+        """Get all unique instructions seen for a specific program, most frequent first."""
+        if not self.exact_counts:
+            return [name for name, _ in self.sketches.program_instructions(program_id)]
+        counts = self.program_instructions.get(program_id)
+        return [name for name, _ in counts.most_common()] if counts else []
+
+    def partial_results(self) -> bytes:
+        """Serialized state of everything counted so far, for merging in another process."""
+        return self.state.to_bytes()
+
+    def merge(self, partial) -> None:
+        """Fold another analyzer's state (or its partial_results() bytes) into this one."""
+        other = AnalyzerState.from_bytes(partial) if isinstance(partial, bytes) else partial
+        self.state.merge(other)
+        if self.exact_counts:
+            for program_id, count in other.program_counts.items():
+                self.program_index.add(program_id, count)
+
+    def snapshot(self, path: str) -> None:
+        """Save the analyzer's state to a file, atomically."""
+        self.state.snapshot(path)
+
+    def restore(self, path: str) -> None:
+        """Replace the analyzer's state with a snapshot written by snapshot()."""
+        self.state = AnalyzerState.restore(path)
+        self.program_index = CountIndex()
+        for program_id, count in self.program_counts.items():
+            self.program_index.add(program_id, count)
 
 # Example usage:
 def analyze_transactions(transactions_list):
     analyzer = SolanaProgramAnalyzer()
     
     for tx in transactions_list:
-        tx_json = json.loads(tx.to_json())
-        analyzer.analyze_transaction(tx_json)
+        analyzer.analyze_transaction(transaction_json(tx))
     
     # Print summary
     stats = analyzer.get_program_stats()
@@ -105,6 +360,9 @@ def analyze_transactions(transactions_list):
         instructions = analyzer.get_program_instructions(program_id)
         if instructions:
             print(f"  Instructions: {', '.join(instructions)}")
+    print(f"\nTop Cross-Program Calls ({stats['inner_instructions']} inner instructions, max depth {stats['max_depth']}):")
+    for (caller, callee), count in analyzer.get_top_call_edges(10):
+        print(f"{caller} -> {callee}: {count} calls")
             
 def analyze_latest_block(http_url):
     """Fetch and analyze the latest Solana block"""
@@ -118,20 +376,14 @@ def analyze_latest_block(http_url):
         current_slot = slot_response.value
         print(f"\nAnalyzing block at slot: {current_slot}")
         
-        # Get block data
-        block = client.get_block(
-            current_slot,
-            encoding="jsonParsed",
-            max_supported_transaction_version=0,
-        )
+        # Get block data as decoded JSON
+        block_data = fetch_block_json(http_url, current_slot, resolve_profile(SolanaProgramAnalyzer).block_config)
         
-        if not block or not block.value:
+        if not block_data:
             print("Could not get block data")
             return
         
-        block_data = block.value
-        
-        return block_data
+        return decode_block(block_data)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
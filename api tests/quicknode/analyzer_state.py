@@ -0,0 +1,133 @@
+import json
+import os
+import struct
+import zlib
+from array import array
+from collections import Counter, defaultdict
+from typing import Optional
+from sketches import AnalyzerSketches
+
+STATE_MAGIC = b"SPAS"
+STATE_VERSION = 1
+
+
+class AnalyzerState:
+    """
+    Everything SolanaProgramAnalyzer has counted, in one mergeable object.
+
+    Counts merge by addition, so merging is associative and commutative and N
+    analyzers over disjoint blocks combine to exactly what one analyzer over
+    all of them would count (sketches merge within their error bounds).
+    """
+
+    def __init__(self, sketches: Optional[AnalyzerSketches] = None):
+        self.transactions = 0
+        self.program_counts = Counter()
+        # Maps programs to a counter of their instruction names
+        self.program_instructions = defaultdict(Counter)
+        # Cross-program invocations: (caller, callee) -> calls, and invocations per stack depth
+        self.call_edges = Counter()
+        self.depth_counts = Counter()
+        self.sketches = sketches
+
+    def merge(self, other: "AnalyzerState") -> "AnalyzerState":
+        """Add another state's counts into this one; returns self."""
+        self.transactions += other.transactions
+        self.program_counts.update(other.program_counts)
+        for program_id, names in other.program_instructions.items():
+            self.program_instructions[program_id].update(names)
+        self.call_edges.update(other.call_edges)
+        self.depth_counts.update(other.depth_counts)
+        if other.sketches:
+            if self.sketches:
+                self.sketches.merge(other.sketches)
+            else:
+                self.sketches = AnalyzerSketches.from_bytes(other.sketches.to_bytes())
+        return self
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact binary form: a string table of program ids and instruction names,
+        then every count as int64 codes, zlib-compressed.
+        """
+        strings = {}
+
+        def code(value: str) -> int:
+            return strings.setdefault(value, len(strings))
+
+        programs = array("q")
+        for program_id, count in self.program_counts.items():
+            programs.extend((code(program_id), count))
+        instructions = array("q")
+        for program_id, names in self.program_instructions.items():
+            for name, count in names.items():
+                instructions.extend((code(program_id), code(name), count))
+        edges = array("q")
+        for (caller, callee), count in self.call_edges.items():
+            edges.extend((code(caller), code(callee), count))
+        depths = array("q")
+        for depth, count in self.depth_counts.items():
+            depths.extend((depth, count))
+
+        sections = [
+            json.dumps(list(strings), separators=(",", ":")).encode(),
+            programs.tobytes(), instructions.tobytes(), edges.tobytes(), depths.tobytes(),
+            self.sketches.to_bytes() if self.sketches else b"",
+        ]
+        body = struct.pack("<Q", self.transactions) + b"".join(
+            struct.pack("<Q", len(section)) + section for section in sections
+        )
+        return STATE_MAGIC + bytes([STATE_VERSION]) + zlib.compress(body, 1)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "AnalyzerState":
+        if data[:4] != STATE_MAGIC:
+            raise ValueError("Not a serialized AnalyzerState")
+        if data[4] != STATE_VERSION:
+            raise ValueError(f"Unsupported AnalyzerState version {data[4]}")
+        body = zlib.decompress(data[5:])
+
+        state = cls()
+        (state.transactions,) = struct.unpack_from("<Q", body)
+        offset = 8
+        sections = []
+        while offset < len(body):
+            (size,) = struct.unpack_from("<Q", body, offset)
+            sections.append(body[offset + 8:offset + 8 + size])
+            offset += 8 + size
+        strings = json.loads(sections[0])
+
+        def ints(section: bytes) -> array:
+            values = array("q")
+            values.frombytes(section)
+            return values
+
+        programs = ints(sections[1])
+        for i in range(0, len(programs), 2):
+            state.program_counts[strings[programs[i]]] = programs[i + 1]
+        instructions = ints(sections[2])
+        for i in range(0, len(instructions), 3):
+            state.program_instructions[strings[instructions[i]]][strings[instructions[i + 1]]] = instructions[i + 2]
+        edges = ints(sections[3])
+        for i in range(0, len(edges), 3):
+            state.call_edges[(strings[edges[i]], strings[edges[i + 1]])] = edges[i + 2]
+        depths = ints(sections[4])
+        for i in range(0, len(depths), 2):
+            state.depth_counts[depths[i]] = depths[i + 1]
+        if sections[5]:
+            state.sketches = AnalyzerSketches.from_bytes(sections[5])
+        return state
+
+    def snapshot(self, path: str) -> None:
+        """Write the state to path atomically, so a crash never leaves a torn snapshot."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_bytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def restore(cls, path: str) -> "AnalyzerState":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
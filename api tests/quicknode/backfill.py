@@ -0,0 +1,211 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+import repo_paths  # noqa: F401 (shared helpers in "web3 tests")
+from analyzer import SolanaProgramAnalyzer
+from analyzer_state import AnalyzerState
+from db_setup import SolanaProgramDB, split_range
+from rate_limiter import configure_endpoint
+from block_fetcher import BlockFetcher, is_skipped
+from block_parser import SolanaBlockParser
+from fetch_profiles import resolve_profile
+from instruction_decoder import decode_block
+
+
+def shard_ranges(start_slot: int, end_slot: int, shard_size: int) -> List[Tuple[int, int]]:
+    """Split [start_slot, end_slot] into consecutive inclusive ranges of at most shard_size slots"""
+    return [(start, min(start + shard_size - 1, end_slot)) for start in range(start_slot, end_slot + 1, shard_size)]
+
+
+def analyze_shard(http_url: str, start_slot: int, end_slot: int, requests_per_second: float,
+                  credits_per_second: Optional[float] = None, concurrency: int = 8, batch_size: int = 1,
+                  parse_events: bool = False) -> Dict:
+    """
+    Fetch, decode and analyze one shard of slots in a worker process
+
+    Args:
+        http_url (str): RPC endpoint URL
+        start_slot (int): First slot of the shard
+        end_slot (int): Last slot of the shard
+        requests_per_second (float): This worker's share of the endpoint's request budget
+        credits_per_second (float): This worker's share of the credit budget, if any
+        concurrency (int): Requests in flight within the worker
+        batch_size (int): Blocks per JSON-RPC batch request
+        parse_events (bool): Also count swap/mint/burn events with SolanaBlockParser
+
+    Returns:
+        dict: The analyzer's serialized state plus block, skip and failure counts for the shard
+    """
+    # Each process has its own limiter, so the budget is split between workers by the coordinator
+    configure_endpoint(http_url, requests_per_second, credits_per_second)
+
+    program_analyzer = SolanaProgramAnalyzer()
+    block_parser = SolanaBlockParser(http_url, concurrency=1) if parse_events else None
+    profile = resolve_profile(*[a for a in (program_analyzer, block_parser) if a is not None])
+    fetcher = BlockFetcher(http_url, concurrency=concurrency, block_config=profile.block_config,
+                           batch_size=batch_size)
+
+    events = Counter()
+    blocks = skipped = 0
+    failed = []
+
+    async def run():
+        nonlocal blocks, skipped
+        async for slot, response in fetcher.iter_blocks(start_slot, end_slot):
+            if response is None:
+                failed.append(slot)
+                continue
+            block = response.get("result")
+            if block is None:
+                # Only a slot without a block is done; any other error leaves it pending
+                if is_skipped(response):
+                    skipped += 1
+                else:
+                    failed.append(slot)
+                continue
+
+            block = decode_block(block)
+            program_analyzer.analyze_block(block, slot)
+            if block_parser:
+                transactions = block_parser.parse_transactions({"result": block})
+                events["swap"] += len(block_parser.parse_swap_events(transactions))
+                events["mint"] += len(block_parser.parse_mint_events(transactions))
+                events["burn"] += len(block_parser.parse_burn_events(transactions))
+            blocks += 1
+
+    try:
+        asyncio.run(run())
+    finally:
+        fetcher.close()
+        if block_parser:
+            block_parser.fetcher.close()
+
+    return {
+        'start_slot': start_slot,
+        'end_slot': end_slot,
+        'blocks': blocks,
+        'skipped': skipped,
+        'failed': failed,
+        'events': dict(events),
+        'analyzer': program_analyzer.partial_results(),
+    }
+
+
+def program_stats(state: AnalyzerState) -> Dict[str, Tuple[int, Dict[str, int]]]:
+    """Turn an analyzer state into SolanaProgramDB batch updates, leaving out utility programs"""
+    instructions = state.program_instructions
+    return {
+        program_id: (count, dict(instructions.get(program_id, {})))
+        for program_id, count in state.program_counts.items()
+        if program_id not in SolanaProgramAnalyzer.UTILITY_PROGRAMS
+    }
+
+
+def run_backfill(http_url: str, start_slot: int, end_slot: int, db_path: str = 'solana_programs.db',
+                 workers: Optional[int] = None, shard_size: int = 500, requests_per_second: float = 4,
+                 credits_per_second: Optional[float] = None, concurrency: int = 8, batch_size: int = 1,
+                 parse_events: bool = False, job: str = 'backfill') -> SolanaProgramAnalyzer:
+    """
+    Analyze a historical slot range across a pool of processes
+
+    The range is cut into shards that workers analyze independently. As each
+    shard finishes, its analyzer state is merged into the program database
+    in a single transaction and into a coordinator-side analyzer for the summary.
+
+    The shard's completed slots are recorded in the progress log in that same
+    transaction, so an interrupted backfill restarted with the same job only
+    analyzes what is missing, including slots that could not be fetched.
+
+    Args:
+        http_url (str): RPC endpoint URL
+        start_slot (int): First slot to analyze
+        end_slot (int): Last slot to analyze
+        db_path (str): Program database to update
+        workers (int): Number of worker processes (defaults to the CPU count)
+        shard_size (int): Slots per shard
+        requests_per_second (float): Total request budget for the endpoint, shared by all workers
+        credits_per_second (float): Optional total credit budget for the endpoint
+        concurrency (int): Requests in flight per worker
+        batch_size (int): Blocks per JSON-RPC batch request
+        parse_events (bool): Also count swap/mint/burn events with SolanaBlockParser
+        job (str): Progress log job name to resume from and record into
+    """
+    db = SolanaProgramDB(db_path)
+    totals = SolanaProgramAnalyzer()
+    pending = db.progress.pending_ranges(job, start_slot, end_slot)
+    shards = [shard for start, end in pending for shard in shard_ranges(start, end, shard_size)]
+    if not shards:
+        print(f"Slots {start_slot}-{end_slot} are already complete for {job}")
+        return totals
+    if pending != [(start_slot, end_slot)]:
+        print(f"Resuming {job}: {sum(end - start + 1 for start, end in pending)} slots left")
+
+    workers = min(workers or os.cpu_count() or 1, len(shards))
+    worker_rps = requests_per_second / workers
+    worker_credits = credits_per_second / workers if credits_per_second else None
+
+    events = Counter()
+    blocks = skipped = 0
+    failed = []
+    started = time.monotonic()
+
+    print(f"Backfilling slots {start_slot}-{end_slot} in {len(shards)} shards on {workers} workers...")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(analyze_shard, http_url, shard_start, shard_end, worker_rps, worker_credits,
+                        concurrency, batch_size, parse_events): (shard_start, shard_end)
+            for shard_start, shard_end in shards
+        }
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                shard_start, shard_end = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Shard {shard_start}-{shard_end} failed: {e}")
+                    failed.extend(range(shard_start, shard_end + 1))
+                    continue
+
+                # Failed slots stay pending so the next run picks them up
+                completed = split_range(shard_start, shard_end, result['failed'])
+                state = AnalyzerState.from_bytes(result['analyzer'])
+                if not db.update_program_stats_batch(program_stats(state), job, completed):
+                    print(f"Shard {shard_start}-{shard_end} was already recorded, skipping")
+                    continue
+                totals.merge(state)
+                events.update(result['events'])
+                blocks += result['blocks']
+                skipped += result['skipped']
+                failed.extend(result['failed'])
+
+                elapsed = time.monotonic() - started
+                print(f"Shard {shard_start}-{shard_end} done ({done}/{len(shards)}): "
+                      f"{blocks} blocks, {skipped} skipped, {len(failed)} failed, {blocks / elapsed:.1f} blocks/s")
+        except KeyboardInterrupt:
+            print("\nBackfill interrupted by user")
+            for future in futures:
+                future.cancel()
+
+    stats = totals.get_program_stats()
+    print(f"\nAnalyzed {blocks} blocks, {stats['total_transactions']} transactions, "
+          f"{stats['unique_programs']} programs")
+    if events:
+        print("Events: " + ", ".join(f"{name}={count}" for name, count in events.items()))
+    if failed:
+        print(f"{len(failed)} slots could not be fetched, first few: {sorted(failed)[:10]}")
+    return totals
+
+
+if __name__ == "__main__":
+    QUICKNODE_HTTP_URL = "https://dimensional-omniscient-needle.solana-mainnet.quiknode.pro/b673c5969121edb8f0170e0025333ad090bc12b3"
+
+    run_backfill(
+        http_url=QUICKNODE_HTTP_URL,
+        start_slot=250000000,
+        end_slot=250010000,
+        requests_per_second=4,
+    )
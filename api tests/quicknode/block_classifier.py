@@ -0,0 +1,95 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+UNKNOWN = "Unknown"
+
+
+class BlockClassifier:
+    """
+    Labels transactions from precompiled program and account lookup tables.
+
+    Rules map a program id (matched against top-level instructions) or an
+    account key (matched anywhere in the transaction's account keys) to a
+    label. They are compiled into dicts of key -> label codes, so classifying
+    a transaction is one dict lookup per account key and per instruction,
+    whatever the number of rules.
+    """
+
+    def __init__(self, program_labels: Optional[Dict[str, str]] = None,
+                 account_labels: Optional[Dict[str, str]] = None):
+        self.labels: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self.program_table: Dict[str, Tuple[int, ...]] = {}
+        self.account_table: Dict[str, Tuple[int, ...]] = {}
+        self.add_rules(program_labels, account_labels)
+
+    def _code(self, label: str) -> int:
+        code = self._codes.get(label)
+        if code is None:
+            code = self._codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def add_rules(self, program_labels: Optional[Dict[str, str]] = None,
+                  account_labels: Optional[Dict[str, str]] = None) -> None:
+        """Compile another rule set into the tables; a key may carry labels from several rule sets."""
+        for table, rules in ((self.program_table, program_labels), (self.account_table, account_labels)):
+            for key, label in (rules or {}).items():
+                code = self._code(label)
+                if code not in table.get(key, ()):
+                    table[key] = table.get(key, ()) + (code,)
+
+    def _transaction_codes(self, transaction_data: dict) -> set:
+        message = (transaction_data.get('transaction') or {}).get('message') or {}
+        keys = message.get('accountKeys') or ()
+        codes = set()
+        account_code = self.account_table.get
+        for key in keys:
+            matched = account_code(key['pubkey'] if isinstance(key, dict) else key)
+            if matched:
+                codes.update(matched)
+        program_code = self.program_table.get
+        for instruction in message.get('instructions') or ():
+            matched = program_code(instruction.get('programId'))
+            if matched:
+                codes.update(matched)
+        return codes
+
+    def classify_transaction(self, transaction_data: dict) -> List[str]:
+        """Labels of one transaction in rule order, or ["Unknown"] if no rule matched."""
+        codes = self._transaction_codes(transaction_data)
+        return [self.labels[code] for code in sorted(codes)] if codes else [UNKNOWN]
+
+    def classify_block(self, block: dict) -> Tuple[List[List[str]], Dict[str, int]]:
+        """
+        Classify every transaction of a decoded block
+
+        Returns:
+            tuple: (labels of each transaction, number of transactions per label)
+        """
+        counts = [0] * len(self.labels)
+        unknown = 0
+        per_transaction = []
+        labels = self.labels
+        for tx in block.get('transactions') or ():
+            codes = self._transaction_codes(tx)
+            if not codes:
+                unknown += 1
+                per_transaction.append([UNKNOWN])
+                continue
+            codes = sorted(codes)
+            for code in codes:
+                counts[code] += 1
+            per_transaction.append([labels[code] for code in codes])
+
+        histogram = {label: count for label, count in zip(labels, counts) if count}
+        if unknown:
+            histogram[UNKNOWN] = unknown
+        return per_transaction, histogram
+
+    def histogram(self, blocks: Iterable[dict]) -> Dict[str, int]:
+        """Transactions per label summed over several blocks."""
+        totals: Dict[str, int] = {}
+        for block in blocks:
+            for label, count in self.classify_block(block)[1].items():
+                totals[label] = totals.get(label, 0) + count
+        return totals
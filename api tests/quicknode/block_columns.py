@@ -0,0 +1,256 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import repo_paths  # noqa: F401 (shared helpers in "web3 tests")
+from log_interpreter import interpret_logs
+
+
+class Dictionary:
+    """Interns strings as dense integer codes; share one across blocks to keep codes comparable."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _counts(codes: np.ndarray, weights: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Group-by over integer codes: (codes present, count or weight sum per code)."""
+    if not len(codes):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    sums = np.bincount(codes, weights=weights)
+    present = np.flatnonzero(np.bincount(codes))
+    return present, sums[present]
+
+
+def _pair_counts(first: np.ndarray, second: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Group-by over pairs of non-negative codes: (first, second, count) per distinct pair."""
+    if not len(first):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    width = int(second.max()) + 1
+    keys, counts = np.unique(first.astype(np.int64) * width + second, return_counts=True)
+    return keys // width, keys % width, counts
+
+
+class BlockColumns:
+    """
+    One block as NumPy columns, for vectorized group-bys.
+
+    Transaction rows: fee, compute_units, success, signer (fee payer code).
+    Instruction rows (top-level and inner): tx, program, instruction (parsed
+    type code, -1 if none), depth, caller (program code, -1 at top level).
+    Logged rows: program and instruction for every `Instruction:` log line.
+    Invocation rows, from the logs: tx, program, parent (invocation row, -1 at
+    top level), compute_units (0 if not logged) and success.
+
+    Program, instruction and signer codes come from Dictionaries, which can be
+    shared so that results of many blocks line up.
+    """
+
+    def __init__(self, programs: Optional[Dictionary] = None, instructions: Optional[Dictionary] = None,
+                 signers: Optional[Dictionary] = None):
+        self.programs = programs if programs is not None else Dictionary()
+        self.instructions = instructions if instructions is not None else Dictionary()
+        self.signers = signers if signers is not None else Dictionary()
+
+    @classmethod
+    def from_block(cls, block: dict, programs: Optional[Dictionary] = None,
+                   instructions: Optional[Dictionary] = None, signers: Optional[Dictionary] = None,
+                   logs: bool = True) -> "BlockColumns":
+        """Build the columns from a decoded (jsonParsed-shape) block; logs=False skips the log columns."""
+        columns = cls(programs, instructions, signers)
+        program_code = columns.programs.code
+        instruction_code = columns.instructions.code
+        signer_code = columns.signers.code
+
+        fee, compute_units, success, signer = [], [], [], []
+        ix_tx, ix_program, ix_instruction, ix_depth, ix_caller = [], [], [], [], []
+        log_program, log_instruction = [], []
+        inv_tx, inv_program, inv_parent, inv_compute_units, inv_success = [], [], [], [], []
+
+        for row, tx in enumerate(block.get('transactions') or ()):
+            meta = tx.get('meta') or {}
+            message = (tx.get('transaction') or {}).get('message') or {}
+            fee.append(meta.get('fee') or 0)
+            compute_units.append(meta.get('computeUnitsConsumed') or 0)
+            success.append(meta.get('err') is None)
+            account_keys = message.get('accountKeys') or ()
+            if account_keys:
+                payer = account_keys[0]
+                signer.append(signer_code(payer.get('pubkey') if isinstance(payer, dict) else payer))
+            else:
+                signer.append(-1)
+
+            inner_by_index = {
+                inner.get('index'): inner.get('instructions') or ()
+                for inner in meta.get('innerInstructions') or ()
+            }
+            for index, instruction in enumerate(message.get('instructions') or ()):
+                program_id = instruction.get('programId')
+                if not program_id:
+                    continue
+                code = program_code(program_id)
+                ix_tx.append(row)
+                ix_program.append(code)
+                ix_instruction.append(_instruction_type(instruction, instruction_code))
+                ix_depth.append(1)
+                ix_caller.append(-1)
+
+                # Same caller resolution as SolanaProgramAnalyzer: the closest shallower invocation
+                stack = [code]
+                for inner in inner_by_index.get(index, ()):
+                    inner_program = inner.get('programId')
+                    if not inner_program:
+                        continue
+                    depth = inner.get('stackHeight') or 2
+                    del stack[depth - 1:]
+                    inner_code = program_code(inner_program)
+                    ix_tx.append(row)
+                    ix_program.append(inner_code)
+                    ix_instruction.append(_instruction_type(inner, instruction_code))
+                    ix_depth.append(depth)
+                    ix_caller.append(stack[-1] if stack else code)
+                    stack.append(inner_code)
+
+            if logs:
+                first = len(inv_tx)
+                invocations = interpret_logs(meta.get('logMessages'))
+                rows = {id(invocation): first + i for i, invocation in enumerate(invocations)}
+                for invocation in invocations:
+                    code = program_code(invocation.program_id)
+                    inv_tx.append(row)
+                    inv_program.append(code)
+                    inv_parent.append(rows[id(invocation.parent)] if invocation.parent else -1)
+                    inv_compute_units.append(invocation.compute_units or 0)
+                    inv_success.append(invocation.success is not False)
+                    for name in invocation.instructions:
+                        log_program.append(code)
+                        log_instruction.append(instruction_code(name))
+
+        columns.fee = np.array(fee, dtype=np.int64)
+        columns.compute_units = np.array(compute_units, dtype=np.int64)
+        columns.success = np.array(success, dtype=bool)
+        columns.signer = np.array(signer, dtype=np.int64)
+        columns.ix_tx = np.array(ix_tx, dtype=np.int64)
+        columns.ix_program = np.array(ix_program, dtype=np.int64)
+        columns.ix_instruction = np.array(ix_instruction, dtype=np.int64)
+        columns.ix_depth = np.array(ix_depth, dtype=np.int64)
+        columns.ix_caller = np.array(ix_caller, dtype=np.int64)
+        columns.log_program = np.array(log_program, dtype=np.int64)
+        columns.log_instruction = np.array(log_instruction, dtype=np.int64)
+        columns.inv_tx = np.array(inv_tx, dtype=np.int64)
+        columns.inv_program = np.array(inv_program, dtype=np.int64)
+        columns.inv_parent = np.array(inv_parent, dtype=np.int64)
+        columns.inv_compute_units = np.array(inv_compute_units, dtype=np.int64)
+        columns.inv_success = np.array(inv_success, dtype=bool)
+        return columns
+
+    @property
+    def transaction_count(self) -> int:
+        return len(self.fee)
+
+    def program_counts(self) -> Dict[str, int]:
+        """Top-level and inner instructions per program."""
+        codes, counts = _counts(self.ix_program)
+        return dict(zip(map(self.programs.__getitem__, codes.tolist()), counts.tolist()))
+
+    def instruction_counts(self, logged: bool = True) -> Dict[Tuple[str, str], int]:
+        """(program, instruction name) counts from parsed instructions and, with logged, the logs."""
+        parsed = self.ix_instruction >= 0
+        programs = self.ix_program[parsed]
+        names = self.ix_instruction[parsed]
+        if logged:
+            programs = np.concatenate([programs, self.log_program])
+            names = np.concatenate([names, self.log_instruction])
+        first, second, counts = _pair_counts(programs, names)
+        return {
+            (self.programs[program], self.instructions[name]): count
+            for program, name, count in zip(first.tolist(), second.tolist(), counts.tolist())
+        }
+
+    def depth_counts(self) -> Dict[int, int]:
+        depths, counts = _counts(self.ix_depth)
+        return dict(zip(depths.tolist(), counts.tolist()))
+
+    def call_edges(self) -> Dict[Tuple[str, str], int]:
+        """(caller, callee) program pairs per cross-program invocation."""
+        inner = self.ix_caller >= 0
+        first, second, counts = _pair_counts(self.ix_caller[inner], self.ix_program[inner])
+        return {
+            (self.programs[caller], self.programs[callee]): count
+            for caller, callee, count in zip(first.tolist(), second.tolist(), counts.tolist())
+        }
+
+    def fee_total(self) -> int:
+        return int(self.fee.sum())
+
+    def failure_rate(self) -> float:
+        return float(1 - self.success.mean()) if len(self.success) else 0.0
+
+    def _program_transactions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Distinct (program, transaction) pairs, so a program is counted once per transaction."""
+        programs, transactions, _ = _pair_counts(self.ix_program, self.ix_tx)
+        return programs, transactions
+
+    def program_transactions(self) -> Dict[str, int]:
+        """Transactions that invoked each program."""
+        programs, _ = self._program_transactions()
+        codes, counts = _counts(programs)
+        return dict(zip(map(self.programs.__getitem__, codes.tolist()), counts.tolist()))
+
+    def program_fees(self) -> Dict[str, int]:
+        """Fees of the transactions that invoked each program."""
+        programs, transactions = self._program_transactions()
+        codes, sums = _counts(programs, self.fee[transactions])
+        return dict(zip(map(self.programs.__getitem__, codes.tolist()), sums.astype(np.int64).tolist()))
+
+    def program_failure_rates(self) -> Dict[str, float]:
+        """Share of each program's transactions that failed."""
+        programs, transactions = self._program_transactions()
+        codes, totals = _counts(programs)
+        _, failed = _counts(programs, (~self.success[transactions]).astype(np.float64))
+        return dict(zip(map(self.programs.__getitem__, codes.tolist()), (failed / totals).tolist()))
+
+    def program_compute_units(self) -> Dict[str, int]:
+        """
+        Compute units each program spent itself, from the logs' `consumed` lines.
+
+        A program's logged consumption includes the programs it invoked, so each
+        invocation's children are subtracted before summing per program.
+        """
+        units = self.inv_compute_units
+        if not len(units):
+            return {}
+        nested = self.inv_parent >= 0
+        children = np.bincount(self.inv_parent[nested], weights=units[nested], minlength=len(units))
+        own = np.maximum(units - children.astype(np.int64), 0)
+        codes, sums = _counts(self.inv_program, own)
+        return dict(zip(map(self.programs.__getitem__, codes.tolist()), sums.astype(np.int64).tolist()))
+
+    def summary(self) -> Dict:
+        return {
+            'transactions': self.transaction_count,
+            'instructions': len(self.ix_program),
+            'fee_total': self.fee_total(),
+            'compute_units': int(self.compute_units.sum()),
+            'failure_rate': self.failure_rate(),
+            'signers': len(np.unique(self.signer[self.signer >= 0])),
+        }
+
+
+def _instruction_type(instruction: dict, instruction_code) -> int:
+    parsed = instruction.get('parsed')
+    name = parsed if isinstance(parsed, str) else parsed.get('type') if parsed else None
+    return instruction_code(name) if name else -1
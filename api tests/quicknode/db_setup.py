@@ -1,10 +1,120 @@
 import sqlite3
 from datetime import datetime
 
+
+def split_range(start_slot, end_slot, exclude=()):
+    """Split [start_slot, end_slot] into the inclusive sub-ranges that avoid the excluded slots"""
+    ranges = []
+    for slot in sorted(s for s in set(exclude) if start_slot <= s <= end_slot):
+        if slot > start_slot:
+            ranges.append((start_slot, slot - 1))
+        start_slot = slot + 1
+    if start_slot <= end_slot:
+        ranges.append((start_slot, end_slot))
+    return ranges
+
+
+class ProgressLog:
+    """
+    Completed slot ranges per job, kept in the program database
+
+    Ranges are written with the same cursor as the stats they produced, so a
+    range is only ever marked complete together with its counts. Adjacent
+    ranges are coalesced to keep the table small during long tails.
+    """
+
+    def __init__(self, db_path='solana_programs.db'):
+        self.db_path = db_path
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS progress (
+                job TEXT,
+                start_slot INTEGER,
+                end_slot INTEGER,
+                updated_at TIMESTAMP,
+                PRIMARY KEY (job, start_slot)
+            )
+            ''')
+            conn.commit()
+
+    @staticmethod
+    def overlapping(c, job, start_slot, end_slot):
+        """Whether any slot of [start_slot, end_slot] is already recorded for the job, or for any job if job is None"""
+        if job is None:
+            return c.execute('''
+                SELECT 1 FROM progress WHERE start_slot <= ? AND end_slot >= ? LIMIT 1
+            ''', (end_slot, start_slot)).fetchone() is not None
+        return c.execute('''
+            SELECT 1 FROM progress WHERE job = ? AND start_slot <= ? AND end_slot >= ? LIMIT 1
+        ''', (job, end_slot, start_slot)).fetchone() is not None
+
+    @staticmethod
+    def record(c, job, ranges):
+        """Record completed ranges using the caller's cursor; the caller commits"""
+        now = datetime.now()
+        for start_slot, end_slot in ranges:
+            before = c.execute('SELECT start_slot FROM progress WHERE job = ? AND end_slot = ?',
+                               (job, start_slot - 1)).fetchone()
+            after = c.execute('SELECT end_slot FROM progress WHERE job = ? AND start_slot = ?',
+                              (job, end_slot + 1)).fetchone()
+            if after:
+                c.execute('DELETE FROM progress WHERE job = ? AND start_slot = ?', (job, end_slot + 1))
+                end_slot = after[0]
+            if before:
+                c.execute('UPDATE progress SET end_slot = ?, updated_at = ? WHERE job = ? AND start_slot = ?',
+                          (end_slot, now, job, before[0]))
+            else:
+                c.execute('INSERT INTO progress (job, start_slot, end_slot, updated_at) VALUES (?, ?, ?, ?)',
+                          (job, start_slot, end_slot, now))
+
+    def overlaps(self, job, start_slot, end_slot):
+        with sqlite3.connect(self.db_path) as conn:
+            return self.overlapping(conn.cursor(), job, start_slot, end_slot)
+
+    def mark_completed(self, job, start_slot, end_slot, exclude=()):
+        """Record a processed range, minus slots that were not processed, in its own transaction"""
+        with sqlite3.connect(self.db_path) as conn:
+            self.record(conn.cursor(), job, split_range(start_slot, end_slot, exclude))
+            conn.commit()
+
+    def completed_ranges(self, job):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute('''
+                SELECT start_slot, end_slot FROM progress WHERE job = ? ORDER BY start_slot
+            ''', (job,)).fetchall()
+
+    def pending_ranges(self, job, start_slot, end_slot):
+        """The parts of [start_slot, end_slot] that the job has not completed yet"""
+        pending = []
+        cursor = start_slot
+        for done_start, done_end in self.completed_ranges(job):
+            if done_end < cursor:
+                continue
+            if done_start > end_slot:
+                break
+            if done_start > cursor:
+                pending.append((cursor, done_start - 1))
+            cursor = done_end + 1
+        if cursor <= end_slot:
+            pending.append((cursor, end_slot))
+        return pending
+
+    def gaps(self, job):
+        """The ranges between the job's completed ranges"""
+        ranges = self.completed_ranges(job)
+        return [(prev_end + 1, start - 1) for (_, prev_end), (start, _) in zip(ranges, ranges[1:])]
+
+    def last_completed_slot(self, job):
+        """Highest slot the job has completed, or None"""
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute('SELECT MAX(end_slot) FROM progress WHERE job = ?', (job,)).fetchone()[0]
+
+
 class SolanaProgramDB:
     def __init__(self, db_path='solana_programs.db'):
         self.db_path = db_path
         self.setup_database()
+        self.progress = ProgressLog(db_path)
     
     def setup_database(self):
         """Create the initial database schema"""
@@ -89,6 +199,61 @@ class SolanaProgramDB:
             
             conn.commit()
     
+    def update_program_stats_batch(self, program_stats, job=None, completed=()):
+        """
+        Apply many program updates in a single transaction
+
+        Args:
+            program_stats (dict): program_id -> (call_count, instructions), where instructions
+                maps instruction names to their own call counts, or is a list of names that
+                are each counted call_count times
+            job (str): Progress log job the updates belong to
+            completed (list): (start_slot, end_slot) ranges the updates cover; they are
+                recorded in the same transaction, and nothing is written if any of
+                them was already recorded
+
+        Returns:
+            bool: False if the ranges were already recorded and the update was skipped
+        """
+        current_time = datetime.now()
+        current_date = current_time.date()
+
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            if job and any(ProgressLog.overlapping(c, job, start, end) for start, end in completed):
+                return False
+
+            c.executemany('''
+            INSERT INTO programs (program_id, first_seen, last_seen, total_calls)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(program_id) DO UPDATE SET
+                last_seen = excluded.last_seen,
+                total_calls = total_calls + excluded.total_calls
+            ''', [(program_id, current_time, current_time, count)
+                  for program_id, (count, _) in program_stats.items()])
+
+            c.executemany('''
+            INSERT INTO daily_stats (program_id, date, call_count)
+            VALUES (?, ?, ?)
+            ON CONFLICT(program_id, date) DO UPDATE SET
+                call_count = call_count + excluded.call_count
+            ''', [(program_id, current_date, count) for program_id, (count, _) in program_stats.items()])
+
+            c.executemany('''
+            INSERT INTO instructions (program_id, instruction_name, first_seen, total_calls)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(program_id, instruction_name) DO UPDATE SET
+                total_calls = total_calls + excluded.total_calls
+            ''', [(program_id, inst_name, current_time, inst_count)
+                  for program_id, (count, instructions) in program_stats.items()
+                  for inst_name, inst_count in (instructions.items() if isinstance(instructions, dict)
+                                                else ((name, count) for name in instructions or []))])
+
+            if job:
+                ProgressLog.record(c, job, completed)
+            conn.commit()
+        return True
+
     def get_top_programs(self, limit=10):
         """Get the most frequently called programs"""
         with sqlite3.connect(self.db_path) as conn:
@@ -0,0 +1,315 @@
+import math
+import random
+import struct
+import time
+from array import array
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+import repo_paths  # noqa: F401 (shared helpers in "web3 tests")
+from instruction_decoder import COMPUTE_BUDGET_PROGRAM
+from windows import TIME_WINDOWS
+
+# Quantiles every sketch keeps cached for fee recommendations
+FEE_QUANTILES = (0.5, 0.75, 0.95)
+
+# Runtime defaults when a transaction sets no compute unit limit
+DEFAULT_INSTRUCTION_CU_LIMIT = 200_000
+MAX_CU_LIMIT = 1_400_000
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (Karnin, Lang and Liberty's KLL).
+
+    Values go into a stack of compactors; a full compactor sorts itself and
+    promotes every other item to the next level, where each item stands for
+    twice as many values. Memory stays around 3 * k items however many
+    values are added, and rank error is roughly 1.7 / k (about 1% at k=200).
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.levels: List[List[float]] = [[]]
+        self._rng = random.Random(seed)
+        self._cache: Dict[float, float] = {}
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def add(self, value: float):
+        self.levels[0].append(value)
+        self.n += 1
+        self._cache = {}
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items.sort()
+                # An odd item out stays behind, so weights are preserved exactly
+                leftover = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[self._rng.getrandbits(1)::2])
+                self.levels[level] = leftover
+                # Adding a level shrinks the lower levels' capacities, so start over
+                level = 0
+                continue
+            level += 1
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._cache = {}
+        self._compress()
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at rank q (0-1); answered from a cache until the sketch changes."""
+        if q not in self._cache:
+            self._cache.update(zip(FEE_QUANTILES + (q,), self.quantiles(FEE_QUANTILES + (q,))))
+        return self._cache[q]
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        weighted = sorted((value, 1 << level) for level, items in enumerate(self.levels) for value in items)
+        if not weighted:
+            return [None] * len(qs)
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for q in qs:
+            target = q * total
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= target:
+                    break
+            results.append(value)
+        return results
+
+    def to_bytes(self) -> bytes:
+        parts = [struct.pack("<IQI", self.k, self.n, len(self.levels))]
+        for items in self.levels:
+            parts.append(struct.pack("<I", len(items)))
+            parts.append(array("d", items).tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KLLSketch":
+        k, n, level_count = struct.unpack_from("<IQI", data)
+        offset = struct.calcsize("<IQI")
+        sketch = cls(k)
+        sketch.n = n
+        sketch.levels = []
+        for _ in range(level_count):
+            (size,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            items = array("d")
+            items.frombytes(data[offset:offset + 8 * size])
+            offset += 8 * size
+            sketch.levels.append(list(items))
+        return sketch
+
+
+class SketchWindow:
+    """KLL sketches over a trailing span of seconds, kept as a ring of per-bucket sketches."""
+
+    def __init__(self, span: float, buckets: int = 12, k: int = 200):
+        self.width = span / buckets
+        self.buckets = buckets
+        self.k = k
+        self.ring: List[Optional[Tuple[int, KLLSketch]]] = [None] * buckets
+        self.current = None
+        self._merged: Optional[KLLSketch] = None
+
+    def add(self, sketch: KLLSketch, position: float):
+        bucket_id = int(position // self.width)
+        if self.current is None or bucket_id > self.current:
+            self.current = bucket_id
+        if bucket_id <= self.current - self.buckets:
+            return  # older than the window
+        slot = self.ring[bucket_id % self.buckets]
+        if not slot or slot[0] != bucket_id:
+            slot = self.ring[bucket_id % self.buckets] = (bucket_id, KLLSketch(self.k))
+        slot[1].merge(sketch)
+        self._merged = None
+
+    def sketch(self, now: Optional[float] = None) -> KLLSketch:
+        """The window's buckets merged into one sketch, rebuilt only after the window changes."""
+        if now is not None and self.current is not None and int(now // self.width) > self.current:
+            self.current = int(now // self.width)
+            self._merged = None
+        if self._merged is None:
+            merged = KLLSketch(self.k)
+            for slot in self.ring:
+                if slot and slot[0] > self.current - self.buckets:
+                    merged.merge(slot[1])
+            self._merged = merged
+        return self._merged
+
+
+class BlockFees:
+    """Fee summary of one block: priority price quantiles, fees and compute units."""
+
+    __slots__ = ("slot", "transactions", "fee_total", "priority_fee_total", "compute_units", "price_quantiles")
+
+    def __init__(self, slot, transactions, fee_total, priority_fee_total, compute_units, price_quantiles):
+        self.slot = slot
+        self.transactions = transactions
+        self.fee_total = fee_total
+        self.priority_fee_total = priority_fee_total
+        self.compute_units = compute_units
+        self.price_quantiles = price_quantiles
+
+    def __repr__(self):
+        return f"BlockFees(slot={self.slot}, transactions={self.transactions}, p50/p75/p95={self.price_quantiles})"
+
+
+def compute_budget(transaction_data: dict) -> Tuple[int, int]:
+    """
+    A transaction's compute unit price (micro-lamports per CU) and compute unit limit.
+
+    Reads the decoded ComputeBudget instructions; without a setComputeUnitLimit
+    the runtime default of 200k CU per other top-level instruction applies.
+    """
+    price = 0
+    limit = None
+    other_instructions = 0
+    message = (transaction_data.get('transaction') or {}).get('message') or {}
+    for instruction in message.get('instructions') or ():
+        if instruction.get('programId') != COMPUTE_BUDGET_PROGRAM:
+            other_instructions += 1
+            continue
+        parsed = instruction.get('parsed')
+        if not isinstance(parsed, dict):
+            continue
+        info = parsed.get('info') or {}
+        if parsed.get('type') == 'setComputeUnitPrice':
+            price = info.get('microLamports', 0)
+        elif parsed.get('type') == 'setComputeUnitLimit':
+            limit = info.get('units')
+    if limit is None:
+        limit = DEFAULT_INSTRUCTION_CU_LIMIT * other_instructions
+    return price, min(limit, MAX_CU_LIMIT)
+
+
+class FeeAnalyzer:
+    """
+    Streaming priority-fee analytics from our own block ingest.
+
+    Every transaction's compute unit price (micro-lamports per CU, from its
+    ComputeBudget instructions) goes into KLL sketches sliced per block, per
+    program it invoked and per rolling time window, plus an all-time sketch.
+    p50/p75/p95 are cached per sketch, so recommendations are constant-time
+    reads between updates. Only the `max_programs` most recently invoked
+    programs keep a sketch, so the long tail of one-off programs doesn't grow
+    memory without bound.
+    """
+
+    # Block fields analyze_block reads (see fetch_profiles)
+    REQUIRED_FIELDS = {'decodedInstructions', 'fee', 'err', 'computeUnits'}
+
+    def __init__(self, k: int = 200, windows: Optional[Dict[str, float]] = None, recent_blocks: int = 150,
+                 exclude_programs=(COMPUTE_BUDGET_PROGRAM,), max_programs: int = 1000):
+        """
+        Args:
+            k (int): KLL accuracy parameter; rank error is about 1.7 / k
+            windows (dict): Rolling windows as name -> seconds (defaults to 1m / 10m / 1h)
+            recent_blocks (int): Number of per-block summaries to keep
+            exclude_programs: Programs not worth a per-program sketch
+            max_programs (int): Per-program sketches kept; the least recently invoked program is evicted
+        """
+        self.k = k
+        self.total = KLLSketch(k)
+        self.max_programs = max_programs
+        self.programs: Dict[str, KLLSketch] = OrderedDict()
+        self.windows = {name: SketchWindow(span, k=k)
+                        for name, span in (TIME_WINDOWS if windows is None else windows).items()}
+        self.blocks: Deque[BlockFees] = deque(maxlen=recent_blocks)
+        self.exclude_programs = set(exclude_programs)
+
+    def analyze_block(self, block_data: dict, slot: Optional[int] = None) -> BlockFees:
+        """Add a decoded block's transactions to every sketch and summarize the block."""
+        block_sketch = KLLSketch(self.k)
+        fee_total = priority_fee_total = compute_units = 0
+        transactions = block_data.get('transactions') or ()
+
+        for tx in transactions:
+            meta = tx.get('meta') or {}
+            price, limit = compute_budget(tx)
+            fee_total += meta.get('fee') or 0
+            compute_units += meta.get('computeUnitsConsumed') or 0
+            # Priority fees are charged on the requested limit, not on what was consumed
+            priority_fee_total += math.ceil(price * limit / 1_000_000)
+            block_sketch.add(price)
+
+            message = (tx.get('transaction') or {}).get('message') or {}
+            invoked = {ix.get('programId') for ix in message.get('instructions') or ()}
+            for program_id in invoked - self.exclude_programs:
+                if not program_id:
+                    continue
+                self.program_sketch(program_id).add(price)
+
+        self.total.merge(block_sketch)
+        block_time = block_data.get('blockTime') or time.time()
+        for window in self.windows.values():
+            window.add(block_sketch, block_time)
+
+        summary = BlockFees(slot, len(transactions), fee_total, priority_fee_total, compute_units,
+                            tuple(block_sketch.quantile(q) for q in FEE_QUANTILES))
+        self.blocks.append(summary)
+        return summary
+
+    def program_sketch(self, program_id: str) -> KLLSketch:
+        """The program's sketch, created (evicting the least recently invoked one) if it has none."""
+        sketch = self.programs.get(program_id)
+        if sketch is None:
+            sketch = self.programs[program_id] = KLLSketch(self.k)
+            if len(self.programs) > self.max_programs:
+                self.programs.popitem(last=False)
+        else:
+            self.programs.move_to_end(program_id)
+        return sketch
+
+    def price_quantiles(self, window: Optional[str] = None, program_id: Optional[str] = None,
+                        now: Optional[float] = None) -> Dict[str, float]:
+        """
+        p50/p75/p95 compute unit price in micro-lamports per CU
+
+        Args:
+            window (str): Rolling window name such as '1m'; all-time if omitted
+            program_id (str): Restrict to transactions that invoked this program (all-time)
+            now (float): Time the window ends at (defaults to the current time)
+        """
+        if program_id is not None:
+            sketch = self.programs.get(program_id)
+        elif window is not None:
+            sketch = self.windows[window].sketch(time.time() if now is None else now)
+        else:
+            sketch = self.total
+        if not sketch:
+            return {}
+        return {f"p{round(q * 100)}": sketch.quantile(q) for q in FEE_QUANTILES}
+
+    def recommend_price(self, percentile: float = 0.75, window: str = '1m',
+                        program_id: Optional[str] = None, now: Optional[float] = None) -> Optional[float]:
+        """Compute unit price to bid, from the program's sketch if it has one, else the window ending `now`."""
+        sketch = self.programs.get(program_id) if program_id else None
+        if not sketch:
+            sketch = self.windows[window].sketch(time.time() if now is None else now)
+        return sketch.quantile(percentile) if sketch else None
+
+    def merge(self, other: "FeeAnalyzer"):
+        """Fold in another analyzer's all-time and per-program sketches, e.g. from a backfill worker."""
+        self.total.merge(other.total)
+        for program_id, sketch in other.programs.items():
+            self.program_sketch(program_id).merge(sketch)
@@ -1,6 +1,13 @@
 from solana.rpc.api import Client
-import json
 from datetime import datetime
+import repo_paths  # noqa: F401 (shared helpers in "web3 tests")
+from block_fetcher import fetch_block_json
+from fetch_profiles import resolve_profile
+from instruction_decoder import decode_block
+from fast_json import transaction_json
+from block_columns import BlockColumns
+from block_classifier import BlockClassifier
+from token_deltas import TokenFlows, to_ui_amount, token_balance_changes
 
 # Known program IDs and their associations
 DEX_PROGRAMS = {
@@ -18,33 +25,26 @@ CEX_WALLETS = {
     # Add more known CEX wallets
 }
 
+# DEX programs, CEX wallets and the token program compiled into lookup tables;
+# more rule sets can be added with TRANSACTION_CLASSIFIER.add_rules
+TRANSACTION_CLASSIFIER = BlockClassifier(
+    program_labels={program_id: f"DEX ({name})" for program_id, name in DEX_PROGRAMS.items()},
+    account_labels={
+        **{wallet: f"CEX ({name})" for wallet, name in CEX_WALLETS.items()},
+        'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA': "Token Transfer",
+    },
+)
+
+# Block fields analyze_transaction reads (see fetch_profiles)
+REQUIRED_FIELDS = {'signatures', 'accountKeys', 'fee', 'err', 'tokenBalances', 'instructions', 'logs', 'computeUnits'}
+
 def identify_transaction_type(tx_json):
     """Identify if transaction is DEX, CEX, or other"""
-    transaction = tx_json['transaction']
-    meta = tx_json['meta']
-    
-    transaction_types = set()
-    
-    # Check program IDs
-    for inst in transaction['message']['instructions']:
-        program_id = inst['programId']
-        if program_id in DEX_PROGRAMS:
-            transaction_types.add(f"DEX ({DEX_PROGRAMS[program_id]})")
-    
-    # Check account involvement
-    for account in transaction['message']['accountKeys']:
-        if account['pubkey'] in CEX_WALLETS:
-            transaction_types.add(f"CEX ({CEX_WALLETS[account['pubkey']]})")
-    
-    # Check for token program involvement
-    if 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA' in [acc['pubkey'] for acc in transaction['message']['accountKeys']]:
-        transaction_types.add("Token Transfer")
-    
-    return list(transaction_types) if transaction_types else ["Unknown"]
+    return TRANSACTION_CLASSIFIER.classify_transaction(tx_json)
 
 def analyze_transaction(tx):
     """Analyze a single transaction and return structured data"""
-    tx_json = json.loads(tx.to_json())
+    tx_json = transaction_json(tx)
     
     tx_info = {
         'signature': tx_json['transaction']['signatures'][0],
@@ -54,17 +54,18 @@ def analyze_transaction(tx):
         'instructions_count': len(tx_json['transaction']['message']['instructions'])
     }
     
-    # Add token transfer analysis
-    if tx_json['meta'].get('preTokenBalances') and tx_json['meta'].get('postTokenBalances'):
-        tx_info['token_transfers'] = []
-        for pre, post in zip(tx_json['meta']['preTokenBalances'], tx_json['meta']['postTokenBalances']):
-            if pre['uiTokenAmount']['uiAmount'] != post['uiTokenAmount']['uiAmount']:
-                tx_info['token_transfers'].append({
-                    'mint': pre['mint'],
-                    'pre_amount': pre['uiTokenAmount']['uiAmount'],
-                    'post_amount': post['uiTokenAmount']['uiAmount'],
-                    'change': (post['uiTokenAmount']['uiAmount'] or 0) - (pre['uiTokenAmount']['uiAmount'] or 0)
-                })
+    # Add token transfer analysis; balances are matched by account index, so created
+    # and closed token accounts count from or to zero
+    changes = token_balance_changes(tx_json)
+    if changes:
+        tx_info['token_transfers'] = [{
+            'mint': change['mint'],
+            'owner': change['owner'],
+            'pre_amount': to_ui_amount(change['pre_raw'], change['decimals']),
+            'post_amount': to_ui_amount(change['post_raw'], change['decimals']),
+            'raw_change': change['raw_change'],
+            'change': change['change'],
+        } for change in changes]
     
     return tx_info
 
@@ -76,30 +77,37 @@ def analyze_latest_block(http_url):
         current_slot = slot_response.value
         print(f"\nAnalyzing block at slot: {current_slot}")
         
-        block = client.get_block(current_slot,
-                                 encoding="jsonParsed",
-                                 max_supported_transaction_version=0,
-                                 )
+        block_data = fetch_block_json(http_url, current_slot, resolve_profile(REQUIRED_FIELDS).block_config)
         
-        if not block or not block.value:
+        if not block_data:
             print("Could not get block data")
             return
         
-        block_data = block.value
-        
+        block = decode_block(block_data)
+        transactions = block.get('transactions', [])
+        columns = BlockColumns.from_block(block)
+        summary = columns.summary()
         print(f"\nBlock Overview:")
-        print(f"Number of Transactions: {len(block_data.transactions)}")
+        print(f"Number of Transactions: {len(transactions)}")
+        print(f"Total Fees: {summary['fee_total']} lamports")
+        print(f"Compute Units: {summary['compute_units']}")
+        print(f"Failure Rate: {summary['failure_rate']:.1%}")
+
+        # Per-program breakdowns, all from vectorized group-bys over the block's columns
+        fees = columns.program_fees()
+        failure_rates = columns.program_failure_rates()
+        compute_units = columns.program_compute_units()
+        print("\nTop Programs by Compute Units:")
+        for program_id, units in sorted(compute_units.items(), key=lambda item: item[1], reverse=True)[:5]:
+            print(f"{program_id}: {units} CU, {fees.get(program_id, 0)} lamports in fees, "
+                  f"{failure_rates.get(program_id, 0):.1%} failed")
         
-        # Track transaction types in block
-        transaction_type_counts = {}
+        # Classify the whole block in one pass
+        _, transaction_type_counts = TRANSACTION_CLASSIFIER.classify_block(block)
         
-        for idx, tx in enumerate(block_data.transactions, 1):
+        for idx, tx in enumerate(transactions, 1):
             tx_info = analyze_transaction(tx)
             
-            # Update transaction type counts
-            for tx_type in tx_info['transaction_types']:
-                transaction_type_counts[tx_type] = transaction_type_counts.get(tx_type, 0) + 1
-            
             print(f"\nTransaction {idx}:")
             print(f"Signature: {tx_info['signature']}")
             print(f"Type: {', '.join(tx_info['transaction_types'])}")
@@ -109,11 +117,16 @@ def analyze_latest_block(http_url):
                 print("Token Transfers:")
                 for transfer in tx_info['token_transfers']:
                     print(f"  Mint: {transfer['mint']}")
+                    print(f"  Owner: {transfer['owner']}")
                     print(f"  Change: {transfer['change']}")
             
             if idx >= 5:  # Limit output for clarity
                 break
         
+        print("\nLargest Token Net Flows:")
+        for mint, owner, amount in TokenFlows.from_block(block).largest(5):
+            print(f"{owner}: {amount:+} of {mint}")
+
         print("\nTransaction Type Summary:")
         for tx_type, count in transaction_type_counts.items():
             print(f"{tx_type}: {count} transactions")
@@ -0,0 +1,18 @@
+"""
+Puts the repository's shared script directories on sys.path.
+
+The RPC helpers (block_fetcher, rate_limiter, fetch_profiles, ...) live in
+"web3 tests" and the event models in "graph tests"; neither directory can be
+a package because of the space in its name. Modules here import this first,
+so they work from any working directory without setting PYTHONPATH.
+"""
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SHARED_DIRS = ("web3 tests", "graph tests")
+
+for _name in SHARED_DIRS:
+    _path = os.path.join(REPO_ROOT, _name)
+    if _path not in sys.path:
+        sys.path.append(_path)
@@ -0,0 +1,352 @@
+import hashlib
+import json
+import math
+import struct
+from array import array
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+from windows import CountIndex
+
+
+def _key_bytes(key) -> bytes:
+    if isinstance(key, tuple):
+        return "\x00".join(key).encode()
+    return str(key).encode()
+
+
+def _hash64(key) -> Tuple[int, int]:
+    """Two independent 64-bit hashes of a key, stable across processes (unlike hash())."""
+    digest = hashlib.blake2b(_key_bytes(key), digest_size=16).digest()
+    return struct.unpack("<QQ", digest)
+
+
+def _json_key(key):
+    return list(key) if isinstance(key, tuple) else key
+
+
+def _from_json_key(key):
+    return tuple(key) if isinstance(key, list) else key
+
+
+class CountMinSketch:
+    """
+    Approximate counts in a fixed depth x width table of counters.
+
+    Estimates never undercount; with probability 1 - delta they overcount by
+    at most epsilon times the total of everything added.
+    """
+
+    def __init__(self, epsilon: float = 0.001, delta: float = 0.01):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.table = array("Q", bytes(8 * self.width * self.depth))
+        self.total = 0
+
+    def _cells(self, key) -> Iterable[int]:
+        h1, h2 = _hash64(key)
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, key, n: int = 1):
+        table = self.table
+        for cell in self._cells(key):
+            table[cell] += n
+        self.total += n
+
+    def estimate(self, key) -> int:
+        table = self.table
+        return min(table[cell] for cell in self._cells(key))
+
+    def merge(self, other: "CountMinSketch"):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Count-Min sketches must have the same dimensions to merge")
+        table = self.table
+        for i, count in enumerate(other.table):
+            if count:
+                table[i] += count
+        self.total += other.total
+
+    def to_bytes(self) -> bytes:
+        return struct.pack("<ddQ", self.epsilon, self.delta, self.total) + self.table.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CountMinSketch":
+        epsilon, delta, total = struct.unpack_from("<ddQ", data)
+        sketch = cls(epsilon, delta)
+        sketch.table = array("Q")
+        sketch.table.frombytes(data[struct.calcsize("<ddQ"):])
+        sketch.total = total
+        return sketch
+
+
+class SpaceSaving:
+    """
+    Top-K heavy hitters in a fixed number of counters (the Space-Saving algorithm).
+
+    When a new key arrives and every counter is taken, it replaces the key with
+    the lowest count and inherits that count as its error. Any key whose true
+    count exceeds total / capacity is guaranteed to be tracked, and each reported
+    count overestimates the true one by at most its error.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts = CountIndex()
+        self.errors: Dict[Hashable, int] = {}
+        self.total = 0
+
+    @classmethod
+    def for_error(cls, epsilon: float) -> "SpaceSaving":
+        """Sized so that no count is off by more than epsilon times the total."""
+        return cls(math.ceil(1 / epsilon))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, key):
+        return key in self.counts.counts
+
+    def add(self, key, n: int = 1) -> Optional[Hashable]:
+        """Count a key; returns the key it evicted, if any."""
+        self.total += n
+        counts = self.counts
+        if key in counts.counts or len(counts) < self.capacity:
+            counts.add(key, n)
+            self.errors.setdefault(key, 0)
+            return None
+
+        evicted = next(iter(counts.tail.keys))
+        floor = counts.tail.count
+        counts.add(evicted, -floor)
+        del self.errors[evicted]
+        counts.add(key, floor + n)
+        self.errors[key] = floor
+        return evicted
+
+    def estimate(self, key) -> int:
+        """Upper bound on the key's count (the smallest tracked count if it is not tracked)."""
+        count = self.counts.get(key)
+        if count:
+            return count
+        return self.counts.tail.count if len(self.counts) >= self.capacity else 0
+
+    def error(self, key) -> int:
+        return self.errors.get(key, self.estimate(key))
+
+    def top(self, k: int, exclude=()) -> List[Tuple[Hashable, int]]:
+        return self.counts.top(k, exclude)
+
+    def items(self) -> Iterable[Tuple[Hashable, int]]:
+        return self.counts.counts.items()
+
+    def merge(self, other: "SpaceSaving"):
+        """Fold in another summary, keeping the highest counts within this one's capacity."""
+        # A key missing from a full summary may have been counted up to that summary's minimum
+        floor = self.counts.tail.count if len(self.counts) >= self.capacity else 0
+        other_floor = other.counts.tail.count if len(other.counts) >= other.capacity else 0
+        merged = {}
+        for key in set(self.counts.counts) | set(other.counts.counts):
+            count = self.counts.get(key, floor) + other.counts.get(key, other_floor)
+            error = self.errors.get(key, floor) + other.errors.get(key, other_floor)
+            merged[key] = (count, error)
+
+        kept = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:self.capacity]
+        self.counts = CountIndex()
+        self.errors = {}
+        for key, (count, error) in kept:
+            self.counts.add(key, count)
+            self.errors[key] = error
+        self.total += other.total
+
+    def to_bytes(self) -> bytes:
+        entries = [[_json_key(key), count, self.errors[key]] for key, count in self.counts.counts.items()]
+        return json.dumps([self.capacity, self.total, entries], separators=(",", ":")).encode()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SpaceSaving":
+        capacity, total, entries = json.loads(data)
+        sketch = cls(capacity)
+        for key, count, error in entries:
+            key = _from_json_key(key)
+            sketch.counts.add(key, count)
+            sketch.errors[key] = error
+        sketch.total = total
+        return sketch
+
+
+class HyperLogLog:
+    """
+    Distinct-count estimate in 2**precision one-byte registers.
+
+    The relative standard error is about 1.04 / sqrt(2**precision): 3.2% at
+    precision 10 (1 KiB), 1.6% at 12 (4 KiB).
+    """
+
+    def __init__(self, precision: int = 10):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @classmethod
+    def for_error(cls, relative_error: float) -> "HyperLogLog":
+        return cls(min(16, max(4, math.ceil(2 * math.log2(1.04 / relative_error)))))
+
+    def add(self, key):
+        h = _hash64(key)[0]
+        index = h >> (64 - self.precision)
+        rest = (h << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = 64 - self.precision + 1 if rest == 0 else 64 - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Small cardinalities: linear counting over the empty registers is more accurate
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def merge(self, other: "HyperLogLog"):
+        if self.precision != other.precision:
+            raise ValueError("HyperLogLogs must have the same precision to merge")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        sketch = cls(data[0])
+        sketch.registers = bytearray(data[1:])
+        return sketch
+
+
+class AnalyzerSketches:
+    """
+    Fixed-memory counters for SolanaProgramAnalyzer.
+
+    Space-Saving summaries track the heaviest programs, (program, instruction)
+    pairs, accounts, signers, (caller, callee) call edges and invocation depths;
+    a Count-Min sketch answers per-account counts for accounts that fell out of
+    the summary; and each tracked program keeps a HyperLogLog of its distinct
+    signers, dropped when the program is evicted.
+    """
+
+    def __init__(self, epsilon: float = 0.001, delta: float = 0.01, capacity: Optional[int] = None,
+                 signer_error: float = 0.033):
+        capacity = capacity or math.ceil(1 / epsilon)
+        self.epsilon = epsilon
+        self.delta = delta
+        self.signer_error = signer_error
+        self.programs = SpaceSaving(capacity)
+        self.instructions = SpaceSaving(capacity)
+        self.accounts = SpaceSaving(capacity)
+        self.signers = SpaceSaving(capacity)
+        self.call_edges = SpaceSaving(capacity)
+        self.depths = SpaceSaving(capacity)
+        self.account_counts = CountMinSketch(epsilon, delta)
+        self.program_signers: Dict[str, HyperLogLog] = {}
+
+    def add_program(self, program_id: str, instruction: Optional[str] = None, n: int = 1):
+        evicted = self.programs.add(program_id, n)
+        if evicted is not None:
+            self.program_signers.pop(evicted, None)
+        if instruction:
+            self.instructions.add((program_id, instruction), n)
+
+    def add_instruction(self, program_id: str, instruction: str, n: int = 1):
+        self.instructions.add((program_id, instruction), n)
+
+    def add_call_edge(self, edge: Tuple[str, str], n: int = 1):
+        self.call_edges.add(edge, n)
+
+    def add_depth(self, depth: int, n: int = 1):
+        self.depths.add(depth, n)
+
+    def add_transaction(self, program_ids: Iterable[str], accounts: Iterable[str], signers: Iterable[str]):
+        """Count a transaction's accounts and signers, and its signers against each program it called."""
+        for account in accounts:
+            self.accounts.add(account)
+            self.account_counts.add(account)
+        signers = list(signers)
+        for signer in signers:
+            self.signers.add(signer)
+        for program_id in program_ids:
+            if program_id not in self.programs:
+                continue
+            hll = self.program_signers.get(program_id)
+            if hll is None:
+                hll = self.program_signers[program_id] = HyperLogLog.for_error(self.signer_error)
+            for signer in signers:
+                hll.add(signer)
+
+    def distinct_signers(self, program_id: str) -> int:
+        hll = self.program_signers.get(program_id)
+        return hll.estimate() if hll else 0
+
+    def program_instructions(self, program_id: str) -> List[Tuple[str, int]]:
+        """Tracked instruction names of one program, most frequent first."""
+        names = [(name, count) for (pid, name), count in self.instructions.items() if pid == program_id]
+        return sorted(names, key=lambda item: item[1], reverse=True)
+
+    def merge(self, other: "AnalyzerSketches"):
+        self.programs.merge(other.programs)
+        self.instructions.merge(other.instructions)
+        self.accounts.merge(other.accounts)
+        self.signers.merge(other.signers)
+        self.call_edges.merge(other.call_edges)
+        self.depths.merge(other.depths)
+        self.account_counts.merge(other.account_counts)
+        for program_id, hll in other.program_signers.items():
+            if program_id in self.program_signers:
+                self.program_signers[program_id].merge(hll)
+            else:
+                self.program_signers[program_id] = HyperLogLog.from_bytes(hll.to_bytes())
+        # Keep HyperLogLogs only for programs that survived the merge
+        for program_id in [p for p in self.program_signers if p not in self.programs]:
+            del self.program_signers[program_id]
+
+    def to_bytes(self) -> bytes:
+        """Serialize every sketch, for merging across workers or persisting."""
+        parts = [
+            json.dumps([self.epsilon, self.delta, self.signer_error, list(self.program_signers)]).encode(),
+            self.programs.to_bytes(), self.instructions.to_bytes(), self.accounts.to_bytes(),
+            self.signers.to_bytes(), self.account_counts.to_bytes(),
+        ] + [hll.to_bytes() for hll in self.program_signers.values()] + [
+            self.call_edges.to_bytes(), self.depths.to_bytes(),
+        ]
+        return b"".join(struct.pack("<I", len(part)) + part for part in parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "AnalyzerSketches":
+        parts = []
+        offset = 0
+        while offset < len(data):
+            (size,) = struct.unpack_from("<I", data, offset)
+            if offset + 4 + size > len(data):
+                raise ValueError("Truncated AnalyzerSketches payload")
+            parts.append(data[offset + 4:offset + 4 + size])
+            offset += 4 + size
+        if not parts:
+            raise ValueError("Empty AnalyzerSketches payload")
+
+        epsilon, delta, signer_error, program_ids = json.loads(parts[0])
+        if len(parts) != 8 + len(program_ids):
+            raise ValueError(f"Expected {8 + len(program_ids)} AnalyzerSketches parts, got {len(parts)}")
+        sketches = cls(epsilon, delta, signer_error=signer_error)
+        sketches.programs = SpaceSaving.from_bytes(parts[1])
+        sketches.instructions = SpaceSaving.from_bytes(parts[2])
+        sketches.accounts = SpaceSaving.from_bytes(parts[3])
+        sketches.signers = SpaceSaving.from_bytes(parts[4])
+        sketches.account_counts = CountMinSketch.from_bytes(parts[5])
+        sketches.program_signers = {
+            program_id: HyperLogLog.from_bytes(part) for program_id, part in zip(program_ids, parts[6:])
+        }
+        sketches.call_edges = SpaceSaving.from_bytes(parts[-2])
+        sketches.depths = SpaceSaving.from_bytes(parts[-1])
+        return sketches
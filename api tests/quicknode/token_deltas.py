@@ -0,0 +1,157 @@
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from block_columns import Dictionary
+
+# Beyond this the int64 columns could overflow, so sums fall back to Python integers
+_INT64_SAFE = 2 ** 63 - 1
+
+
+def _raw_amount(balance: dict) -> int:
+    return int((balance.get('uiTokenAmount') or {}).get('amount') or 0)
+
+
+def _decimals(balance: dict) -> int:
+    return (balance.get('uiTokenAmount') or {}).get('decimals') or 0
+
+
+def to_ui_amount(raw: int, decimals: int) -> Decimal:
+    """Exact decimal amount of a raw token amount."""
+    return Decimal(raw).scaleb(-decimals)
+
+
+def _owner(balance: dict, account_keys) -> Optional[str]:
+    owner = balance.get('owner')
+    if owner:
+        return owner
+    # Older responses have no owner; fall back to the token account itself
+    index = balance.get('accountIndex')
+    if account_keys and index is not None and index < len(account_keys):
+        key = account_keys[index]
+        return key.get('pubkey') if isinstance(key, dict) else key
+    return None
+
+
+def token_balance_changes(transaction_data: dict) -> List[dict]:
+    """
+    Token balance changes of one transaction, joined by account index.
+
+    Pre and post balances are sparse: an account created by the transaction
+    only has a post balance and a closed one only a pre balance, so they are
+    matched on accountIndex with the missing side counted as zero. Amounts are
+    raw integers; `change` is the exact decimal amount.
+    """
+    meta = transaction_data.get('meta') or {}
+    message = (transaction_data.get('transaction') or {}).get('message') or {}
+    account_keys = message.get('accountKeys')
+    pre = {balance.get('accountIndex'): balance for balance in meta.get('preTokenBalances') or ()}
+    post = {balance.get('accountIndex'): balance for balance in meta.get('postTokenBalances') or ()}
+
+    changes = []
+    for index in sorted(pre.keys() | post.keys()):
+        before, after = pre.get(index), post.get(index)
+        balance = after or before
+        pre_amount = _raw_amount(before) if before else 0
+        post_amount = _raw_amount(after) if after else 0
+        if pre_amount == post_amount:
+            continue
+        decimals = _decimals(balance)
+        changes.append({
+            'account_index': index,
+            'mint': balance.get('mint'),
+            'owner': _owner(balance, account_keys),
+            'decimals': decimals,
+            'pre_raw': pre_amount,
+            'post_raw': post_amount,
+            'raw_change': post_amount - pre_amount,
+            'change': to_ui_amount(post_amount - pre_amount, decimals),
+        })
+    return changes
+
+
+class TokenFlows:
+    """
+    Net token flow per (mint, owner) for a whole block, from one vectorized pass.
+
+    Every pre balance is a negative row and every post balance a positive one,
+    so grouping the rows by (mint, owner) joins pre and post by account
+    implicitly: accounts created or closed in a transaction simply have one side.
+    """
+
+    def __init__(self, mints: Dictionary, owners: Dictionary, mint: np.ndarray, owner: np.ndarray,
+                 raw_delta: np.ndarray, decimals: np.ndarray):
+        self.mints = mints
+        self.owners = owners
+        self.mint = mint
+        self.owner = owner
+        self.raw_delta = raw_delta
+        self.decimals = decimals
+
+    @classmethod
+    def from_block(cls, block: dict) -> "TokenFlows":
+        mints, owners = Dictionary(), Dictionary()
+        mint_codes, owner_codes, amounts, decimals = [], [], [], []
+        for tx in block.get('transactions') or ():
+            meta = tx.get('meta') or {}
+            account_keys = ((tx.get('transaction') or {}).get('message') or {}).get('accountKeys')
+            for sign, balances in ((-1, meta.get('preTokenBalances')), (1, meta.get('postTokenBalances'))):
+                for balance in balances or ():
+                    ui = balance.get('uiTokenAmount') or {}
+                    mint_codes.append(mints.code(balance.get('mint')))
+                    owner_codes.append(owners.code(_owner(balance, account_keys)))
+                    amounts.append(sign * int(ui.get('amount') or 0))
+                    decimals.append(ui.get('decimals') or 0)
+
+        if not amounts:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(mints, owners, empty, empty, empty, empty)
+
+        keys = np.array(mint_codes, dtype=np.int64) * len(owners) + np.array(owner_codes, dtype=np.int64)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        # Raw amounts are u64; stay in int64 only while no sum can overflow it
+        if max(map(abs, amounts)) * len(amounts) <= _INT64_SAFE:
+            values = np.array(amounts, dtype=np.int64)
+            raw_delta = np.zeros(len(unique_keys), dtype=np.int64)
+        else:
+            values = np.array(amounts, dtype=object)
+            raw_delta = np.zeros(len(unique_keys), dtype=object)
+        np.add.at(raw_delta, inverse, values)
+        group_decimals = np.zeros(len(unique_keys), dtype=np.int64)
+        group_decimals[inverse] = decimals
+
+        changed = raw_delta != 0
+        return cls(mints, owners, unique_keys[changed] // len(owners), unique_keys[changed] % len(owners),
+                   raw_delta[changed], group_decimals[changed])
+
+    def __len__(self):
+        return len(self.raw_delta)
+
+    def flows(self) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """(mint, owner) -> (raw net flow, decimals) for every owner whose balance changed."""
+        return {
+            (self.mints[mint], self.owners[owner]): (int(delta), int(decimals))
+            for mint, owner, delta, decimals in zip(self.mint.tolist(), self.owner.tolist(),
+                                                     self.raw_delta.tolist(), self.decimals.tolist())
+        }
+
+    def mint_flows(self, mint: str) -> List[Tuple[str, Decimal]]:
+        """Owners' net flows of one mint, largest inflow first."""
+        code = self.mints.codes.get(mint)
+        if code is None:
+            return []
+        rows = np.flatnonzero(self.mint == code)
+        flows = [(self.owners[int(self.owner[row])], to_ui_amount(int(self.raw_delta[row]), int(self.decimals[row])))
+                 for row in rows]
+        return sorted(flows, key=lambda flow: flow[1], reverse=True)
+
+    def largest(self, n: int = 10) -> List[Tuple[str, str, Decimal]]:
+        """The n largest absolute net flows as (mint, owner, amount); mints are compared in whole tokens."""
+        if not len(self):
+            return []
+        scaled = np.abs(self.raw_delta.astype(np.float64)) / np.power(10.0, self.decimals)
+        rows = np.argsort(-scaled, kind='stable')[:n]
+        return [
+            (self.mints[int(self.mint[row])], self.owners[int(self.owner[row])],
+             to_ui_amount(int(self.raw_delta[row]), int(self.decimals[row])))
+            for row in rows
+        ]
@@ -0,0 +1,220 @@
+import time
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Last 1 min / 10 min / 1 h, by block time and by slot (~400ms per slot)
+TIME_WINDOWS = {'1m': 60, '10m': 600, '1h': 3600}
+SLOT_WINDOWS = {'150 slots': 150, '1500 slots': 1500, '9000 slots': 9000}
+
+
+class _CountNode:
+    __slots__ = ('count', 'keys', 'higher', 'lower')
+
+    def __init__(self, count: int):
+        self.count = count
+        self.keys = set()
+        self.higher = None
+        self.lower = None
+
+
+class CountIndex:
+    """
+    Counts kept in a linked list of count values, highest first.
+
+    Each node holds the keys that currently have its count, so top-K walks
+    from the head and touches only K keys, and incrementing a key moves it
+    to an adjacent node instead of re-sorting anything.
+    """
+
+    def __init__(self):
+        self.counts: Dict[Hashable, int] = {}
+        self._nodes: Dict[int, _CountNode] = {}
+        self.head = None
+        self.tail = None
+
+    def __len__(self):
+        return len(self.counts)
+
+    def get(self, key, default: int = 0) -> int:
+        return self.counts.get(key, default)
+
+    def _node_for(self, count: int, start: Optional[_CountNode]) -> _CountNode:
+        """Return the node for count, linking a new one into place by walking from start."""
+        node = self._nodes.get(count)
+        if node:
+            return node
+        node = self._nodes[count] = _CountNode(count)
+
+        cur = start or self.head
+        if cur is None:
+            self.head = self.tail = node
+            return node
+        if cur.count > count:
+            while cur.lower and cur.lower.count > count:
+                cur = cur.lower
+            above, below = cur, cur.lower
+        else:
+            while cur.higher and cur.higher.count < count:
+                cur = cur.higher
+            above, below = cur.higher, cur
+
+        node.higher, node.lower = above, below
+        if above:
+            above.lower = node
+        else:
+            self.head = node
+        if below:
+            below.higher = node
+        else:
+            self.tail = node
+        return node
+
+    def _unlink(self, node: _CountNode):
+        if node.higher:
+            node.higher.lower = node.lower
+        else:
+            self.head = node.lower
+        if node.lower:
+            node.lower.higher = node.higher
+        else:
+            self.tail = node.higher
+        del self._nodes[node.count]
+
+    def add(self, key, n: int = 1):
+        """Change a key's count by n (which may be negative); keys that reach zero are dropped."""
+        old = self.counts.get(key, 0)
+        new = old + n
+        if new == old:
+            return
+        old_node = self._nodes.get(old) if old else None
+
+        if new > 0:
+            self._node_for(new, old_node or self.tail).keys.add(key)
+            self.counts[key] = new
+        else:
+            del self.counts[key]
+        if old_node:
+            old_node.keys.discard(key)
+            if not old_node.keys:
+                self._unlink(old_node)
+
+    def top(self, k: int, exclude=()) -> List[Tuple[Hashable, int]]:
+        """The k highest-count keys, skipping any in exclude."""
+        result = []
+        node = self.head
+        while node and len(result) < k:
+            for key in node.keys:
+                if key not in exclude:
+                    result.append((key, node.count))
+                    if len(result) == k:
+                        break
+            node = node.lower
+        return result
+
+
+class SlidingWindow:
+    """
+    Counts over the trailing `span` seconds or slots, in a ring of buckets.
+
+    Adding goes into the current bucket and the window totals at once;
+    when a bucket falls out of the span its counts are subtracted again, so
+    totals are always current without ever rescanning the window.
+    """
+
+    def __init__(self, span: float, buckets: int = 60):
+        self.span = span
+        self.buckets = buckets
+        self.width = span / buckets
+        self.ring: List[Optional[Tuple[int, Counter]]] = [None] * buckets
+        self.current = None
+        self.totals = CountIndex()
+
+    def advance(self, position: float):
+        """Move the window's end to position, expiring buckets that fall out of it."""
+        bucket_id = int(position // self.width)
+        if self.current is not None:
+            if bucket_id <= self.current:
+                return
+            # Only buckets still in the ring can expire, so this is at most one turn however far the window jumps
+            first = bucket_id - self.buckets + 1
+            for expired_id in range(self.current - self.buckets + 1, min(first, self.current + 1)):
+                slot = self.ring[expired_id % self.buckets]
+                if slot and slot[0] == expired_id:
+                    for key, count in slot[1].items():
+                        self.totals.add(key, -count)
+                    self.ring[expired_id % self.buckets] = None
+        self.current = bucket_id
+
+    def add(self, key, position: float, n: int = 1):
+        self.advance(position)
+        bucket_id = int(position // self.width)
+        if bucket_id <= self.current - self.buckets:
+            return  # older than the window
+        slot = self.ring[bucket_id % self.buckets]
+        if not slot or slot[0] != bucket_id:
+            slot = self.ring[bucket_id % self.buckets] = (bucket_id, Counter())
+        slot[1][key] += n
+        self.totals.add(key, n)
+
+    def top(self, k: int, exclude=()) -> List[Tuple[Hashable, int]]:
+        return self.totals.top(k, exclude)
+
+
+class WindowedCounts:
+    """Program and instruction counts over several trailing time and slot windows."""
+
+    def __init__(self, time_windows: Optional[Dict[str, float]] = None,
+                 slot_windows: Optional[Dict[str, int]] = None, buckets: int = 60):
+        time_windows = TIME_WINDOWS if time_windows is None else time_windows
+        slot_windows = SLOT_WINDOWS if slot_windows is None else slot_windows
+        self.time_windows = {name: (SlidingWindow(span, buckets), SlidingWindow(span, buckets))
+                             for name, span in time_windows.items()}
+        self.slot_windows = {name: (SlidingWindow(span, buckets), SlidingWindow(span, buckets))
+                             for name, span in slot_windows.items()}
+
+    def observe(self, program_id: str, instruction: Optional[str] = None, slot: Optional[int] = None,
+                timestamp: Optional[float] = None, n: int = 1):
+        """Count n program calls (and their instruction name) at a slot and block time."""
+        self._add(0, program_id, slot, timestamp, n)
+        if instruction:
+            self._add(1, (program_id, instruction), slot, timestamp, n)
+
+    def observe_instruction(self, program_id: str, instruction: str, slot: Optional[int] = None,
+                            timestamp: Optional[float] = None, n: int = 1):
+        """Count an instruction name without counting another call of its program."""
+        self._add(1, (program_id, instruction), slot, timestamp, n)
+
+    def _add(self, which: int, key, slot: Optional[int], timestamp: Optional[float], n: int):
+        if timestamp is None:
+            timestamp = time.time()
+        for window in self.time_windows.values():
+            window[which].add(key, timestamp, n)
+        if slot is not None:
+            for window in self.slot_windows.values():
+                window[which].add(key, slot, n)
+
+    def _window(self, name: str) -> Tuple[SlidingWindow, SlidingWindow]:
+        if name in self.time_windows:
+            return self.time_windows[name]
+        if name in self.slot_windows:
+            return self.slot_windows[name]
+        raise KeyError(f"Unknown window {name!r}, expected one of {self.window_names()}")
+
+    def window_names(self) -> List[str]:
+        return list(self.time_windows) + list(self.slot_windows)
+
+    def top_programs(self, window: str, k: int = 10, exclude=()) -> List[Tuple[str, int]]:
+        return self._window(window)[0].top(k, exclude)
+
+    def top_instructions(self, window: str, k: int = 10) -> List[Tuple[Tuple[str, str], int]]:
+        return self._window(window)[1].top(k)
+
+    def snapshot(self, k: int = 10, exclude=()) -> Dict[str, dict]:
+        """Top programs and instructions for every window, for dashboards."""
+        return {
+            name: {
+                'programs': self.top_programs(name, k, exclude),
+                'instructions': self.top_instructions(name, k),
+            }
+            for name in self.window_names()
+        }
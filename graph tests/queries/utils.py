@@ -1,6 +1,12 @@
+import os
+import sys
 import requests
 import time
 
+# The shared rate limiter lives in "web3 tests", which can't be a package because of the space in its name
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "web3 tests"))
+from rate_limiter import get_rate_limiter
+
 
 ## Fetch data ##
 
@@ -11,6 +17,7 @@ def fetch_transactions_for_day(start_timestamp, end_timestamp, subgraph_url, que
     """
     transactions = []
     skip = 0
+    rate_limiter = get_rate_limiter(subgraph_url)
 
     while True:
         # Set up the query variables
@@ -20,8 +27,11 @@ def fetch_transactions_for_day(start_timestamp, end_timestamp, subgraph_url, que
             "skip": skip
         }
 
-        # Send the GraphQL request
+        # Send the GraphQL request, backing off and retrying the page if throttled
+        rate_limiter.acquire()
         response = requests.post(subgraph_url, json={"query": query, "variables": variables})
+        if rate_limiter.record_response(response.status_code, retry_after=response.headers.get("Retry-After")):
+            continue
         data = response.json()
 
         if "errors" in data:
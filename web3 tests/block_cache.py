@@ -0,0 +1,208 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Iterator, List, Optional, Tuple
+from fast_json import loads
+
+try:
+    import zstandard
+except ImportError:  # zlib keeps the cache usable without the zstd bindings
+    zstandard = None
+
+
+def cache_key(block_config: dict) -> str:
+    """Cache key for the shape of a getBlock response (encoding and detail level)."""
+    return "{}:{}:{}".format(
+        block_config.get("encoding", "json"),
+        block_config.get("transactionDetails", "full"),
+        "rewards" if block_config.get("rewards", True) else "norewards",
+    )
+
+
+class BlockCache:
+    """
+    On-disk cache of raw getBlock responses keyed by (slot, encoding).
+
+    Blocks are compressed and appended to segment files; a SQLite index maps
+    each key to its segment, offset and length. Once the cache grows past
+    `max_bytes`, whole segments are evicted least recently used first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 20 * 1024 ** 3, segment_bytes: int = 256 * 1024 ** 2,
+                 level: int = 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self.codec = "zstd" if zstandard else "zlib"
+        self.level = level
+        # zstd contexts are not thread-safe, so every fetcher thread gets its own
+        self._codecs = threading.local()
+
+        self._lock = threading.Lock()
+        self._touched = {}
+        self.conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self.setup_index()
+        self.active_segment = self._open_segment()
+
+    def setup_index(self):
+        """Create the index schema"""
+        c = self.conn.cursor()
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS blocks (
+            slot INTEGER,
+            encoding TEXT,
+            segment INTEGER,
+            offset INTEGER,
+            length INTEGER,
+            codec TEXT,
+            PRIMARY KEY (slot, encoding)
+        )
+        ''')
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS segments (
+            segment INTEGER PRIMARY KEY,
+            size INTEGER DEFAULT 0,
+            last_access REAL
+        )
+        ''')
+        c.execute('CREATE INDEX IF NOT EXISTS blocks_segment ON blocks (segment)')
+        self.conn.commit()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.blk")
+
+    def _open_segment(self) -> int:
+        """Return the segment to append to, starting a new one if the last is full."""
+        row = self.conn.execute('SELECT segment, size FROM segments ORDER BY segment DESC LIMIT 1').fetchone()
+        if row and row[1] < self.segment_bytes:
+            return row[0]
+        segment = row[0] + 1 if row else 1
+        self.conn.execute('INSERT INTO segments (segment, size, last_access) VALUES (?, 0, ?)', (segment, time.time()))
+        self.conn.commit()
+        return segment
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            compressor = getattr(self._codecs, "compressor", None)
+            if compressor is None:
+                compressor = self._codecs.compressor = zstandard.ZstdCompressor(level=self.level)
+            return compressor.compress(data)
+        return zlib.compress(data, self.level)
+
+    def _decompress(self, data: bytes, codec: str) -> bytes:
+        if codec == "zstd":
+            if not zstandard:
+                raise RuntimeError("Cache entry is zstd-compressed but zstandard is not installed")
+            decompressor = getattr(self._codecs, "decompressor", None)
+            if decompressor is None:
+                decompressor = self._codecs.decompressor = zstandard.ZstdDecompressor()
+            return decompressor.decompress(data)
+        return zlib.decompress(data)
+
+    def put(self, slot: int, encoding: str, data) -> None:
+        """Store a raw getBlock response (bytes, str or already-decoded JSON)."""
+        if isinstance(data, str):
+            data = data.encode()
+        elif not isinstance(data, bytes):
+            data = json.dumps(data).encode()
+        blob = self._compress(data)
+
+        with self._lock:
+            if self.conn.execute('SELECT 1 FROM blocks WHERE slot = ? AND encoding = ?', (slot, encoding)).fetchone():
+                return
+
+            segment = self.active_segment
+            with open(self._segment_path(segment), "ab") as f:
+                offset = f.tell()
+                f.write(blob)
+
+            self.conn.execute('''
+            INSERT INTO blocks (slot, encoding, segment, offset, length, codec)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (slot, encoding, segment, offset, len(blob), self.codec))
+            self.conn.execute('UPDATE segments SET size = size + ?, last_access = ? WHERE segment = ?',
+                              (len(blob), time.time(), segment))
+            self._flush_access()
+            self.conn.commit()
+
+            if offset + len(blob) >= self.segment_bytes:
+                self.active_segment = self._open_segment()
+            self._evict()
+
+    def get(self, slot: int, encoding: str) -> Optional[bytes]:
+        """Return the raw response bytes for a cached block, or None."""
+        with self._lock:
+            row = self.conn.execute('''
+            SELECT segment, offset, length, codec FROM blocks WHERE slot = ? AND encoding = ?
+            ''', (slot, encoding)).fetchone()
+            if not row:
+                return None
+            segment, offset, length, codec = row
+            self._touched[segment] = time.time()
+
+        try:
+            with open(self._segment_path(segment), "rb") as f:
+                f.seek(offset)
+                return self._decompress(f.read(length), codec)
+        except FileNotFoundError:
+            return None
+
+    def get_json(self, slot: int, encoding: str) -> Optional[dict]:
+        """Return a cached block decoded from JSON, or None."""
+        data = self.get(slot, encoding)
+        return loads(data) if data is not None else None
+
+    def slots(self, encoding: str, start_slot: int = 0, end_slot: Optional[int] = None) -> List[int]:
+        """List cached slots for an encoding within [start_slot, end_slot]."""
+        end_slot = end_slot if end_slot is not None else 2 ** 63 - 1
+        with self._lock:
+            rows = self.conn.execute('''
+            SELECT slot FROM blocks WHERE encoding = ? AND slot BETWEEN ? AND ? ORDER BY slot
+            ''', (encoding, start_slot, end_slot)).fetchall()
+        return [row[0] for row in rows]
+
+    def replay(self, encoding: str, start_slot: int = 0, end_slot: Optional[int] = None,
+               decode=loads) -> Iterator[Tuple[int, dict]]:
+        """Yield (slot, block_response) for every cached block in slot order."""
+        for slot in self.slots(encoding, start_slot, end_slot):
+            data = self.get(slot, encoding)
+            if data is not None:
+                yield slot, decode(data)
+
+    def total_bytes(self) -> int:
+        return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM segments').fetchone()[0]
+
+    def _flush_access(self):
+        """Persist segment access times collected by get()."""
+        if self._touched:
+            self.conn.executemany('UPDATE segments SET last_access = ? WHERE segment = ?',
+                                  [(t, segment) for segment, t in self._touched.items()])
+            self._touched = {}
+
+    def _evict(self):
+        """Drop least recently used segments until the cache fits in max_bytes."""
+        total = self.total_bytes()
+        while total > self.max_bytes:
+            row = self.conn.execute('''
+            SELECT segment, size FROM segments WHERE segment != ? ORDER BY last_access LIMIT 1
+            ''', (self.active_segment,)).fetchone()
+            if not row:
+                break
+            segment, size = row
+            self.conn.execute('DELETE FROM blocks WHERE segment = ?', (segment,))
+            self.conn.execute('DELETE FROM segments WHERE segment = ?', (segment,))
+            self.conn.commit()
+            if os.path.exists(self._segment_path(segment)):
+                os.remove(self._segment_path(segment))
+            total -= size
+
+    def close(self):
+        with self._lock:
+            self._flush_access()
+            self.conn.commit()
+            self.conn.close()
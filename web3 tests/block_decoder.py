@@ -0,0 +1,199 @@
+from typing import Any, Dict, FrozenSet, List, Optional, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Named projections: the fields each one leaves out of the decoded structs.
+# Skipped fields are parsed past by msgspec but never allocated as Python objects.
+PROJECTIONS: Dict[str, FrozenSet[str]] = {
+    "full": frozenset(),
+    "no-logs": frozenset({"logMessages"}),
+    "lean": frozenset({"logMessages", "rewards", "innerInstructions"}),
+    "fees": frozenset({"logMessages", "rewards", "innerInstructions", "preTokenBalances",
+                       "postTokenBalances", "loadedAddresses", "returnData"}),
+}
+
+if msgspec:
+    class Record(msgspec.Struct, omit_defaults=True):
+        """Struct that can also be read like the JSON-RPC dicts it replaces."""
+
+        def get(self, key, default=None):
+            value = getattr(self, key, None)
+            return default if value is None else value
+
+        def __getitem__(self, key):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+
+        def __contains__(self, key):
+            return getattr(self, key, None) is not None
+
+    class AccountKey(Record):
+        pubkey: str
+        signer: bool = False
+        writable: bool = False
+        source: Optional[str] = None
+
+    class Instruction(Record):
+        programId: Optional[str] = None
+        programIdIndex: Optional[int] = None
+        program: Optional[str] = None
+        parsed: Any = None
+        accounts: List[Any] = []
+        data: Optional[str] = None
+        stackHeight: Optional[int] = None
+
+    class Message(Record):
+        accountKeys: List[Union[str, AccountKey]] = []
+        instructions: List[Instruction] = []
+        recentBlockhash: Optional[str] = None
+        addressTableLookups: Optional[List[Any]] = None
+
+    class Transaction(Record):
+        signatures: List[str] = []
+        message: Optional[Message] = None
+        # transactionDetails "accounts" puts the keys here instead of in a message
+        accountKeys: Optional[List[Union[str, AccountKey]]] = None
+
+    class TokenAmount(Record):
+        amount: str = "0"
+        decimals: int = 0
+        uiAmount: Optional[float] = None
+
+    class TokenBalance(Record):
+        accountIndex: int
+        mint: str
+        owner: Optional[str] = None
+        programId: Optional[str] = None
+        uiTokenAmount: Optional[TokenAmount] = None
+
+    class InnerInstructions(Record):
+        index: int
+        instructions: List[Instruction] = []
+
+    _META_FIELDS = [
+        ("err", Any, None),
+        ("status", Any, None),
+        ("fee", int, 0),
+        ("computeUnitsConsumed", Optional[int], None),
+        ("preBalances", List[int], []),
+        ("postBalances", List[int], []),
+        ("preTokenBalances", Optional[List[TokenBalance]], None),
+        ("postTokenBalances", Optional[List[TokenBalance]], None),
+        ("innerInstructions", Optional[List[InnerInstructions]], None),
+        ("logMessages", Optional[List[str]], None),
+        ("rewards", Optional[List[Any]], None),
+        ("loadedAddresses", Any, None),
+        ("returnData", Any, None),
+    ]
+
+    _BLOCK_FIELDS = [
+        ("blockHeight", Optional[int], None),
+        ("blockTime", Optional[int], None),
+        ("blockhash", Optional[str], None),
+        ("parentSlot", Optional[int], None),
+        ("previousBlockhash", Optional[str], None),
+        ("signatures", Optional[List[str]], None),
+        ("rewards", Optional[List[Any]], None),
+    ]
+
+
+def _build_types(excluded: FrozenSet[str]) -> dict:
+    """Create the struct family for one projection."""
+    def fields(spec):
+        return [field for field in spec if field[0] not in excluded]
+
+    meta = msgspec.defstruct("Meta", fields(_META_FIELDS), bases=(Record,))
+    # base64/base58 encodings return the transaction as [data, encoding] instead of an object
+    tx = msgspec.defstruct("TransactionWithMeta", [
+        ("transaction", Union[Transaction, List[str], None], None),
+        ("meta", Optional[meta], None),
+        ("version", Any, None),
+    ], bases=(Record,))
+    block = msgspec.defstruct("Block", fields(_BLOCK_FIELDS) + [("transactions", Optional[List[tx]], None)],
+                              bases=(Record,))
+    response = msgspec.defstruct("BlockResponse", [
+        ("jsonrpc", Optional[str], None),
+        ("id", Any, None),
+        ("result", Optional[block], None),
+        ("error", Any, None),
+    ], bases=(Record,))
+    tx_response = msgspec.defstruct("TransactionResponse", [
+        ("jsonrpc", Optional[str], None),
+        ("id", Any, None),
+        ("result", Optional[tx], None),
+        ("error", Any, None),
+    ], bases=(Record,))
+
+    # blockNotification: params.result.value.block
+    value = msgspec.defstruct("BlockUpdate", [
+        ("slot", Optional[int], None),
+        ("block", Optional[block], None),
+        ("err", Any, None),
+    ], bases=(Record,))
+    update = msgspec.defstruct("BlockNotificationResult", [
+        ("context", Any, None),
+        ("value", Optional[value], None),
+    ], bases=(Record,))
+    params = msgspec.defstruct("BlockNotificationParams", [
+        ("subscription", Any, None),
+        ("result", Optional[update], None),
+    ], bases=(Record,))
+    notification = msgspec.defstruct("BlockNotification", [
+        ("jsonrpc", Optional[str], None),
+        ("method", Optional[str], None),
+        ("params", Optional[params], None),
+        ("id", Any, None),
+        ("result", Any, None),
+        ("error", Any, None),
+    ], bases=(Record,))
+
+    return {"block": response, "transaction": tx_response, "notification": notification}
+
+
+class BlockDecoder:
+    """
+    Decode getBlock / getTransaction responses straight into compact structs.
+
+    The structs answer .get() and [] like the dicts they replace, so existing
+    parsers can consume them unchanged. Fields left out by the projection are
+    skipped while decoding and read back as missing.
+    """
+
+    _types_cache: Dict[FrozenSet[str], dict] = {}
+
+    def __init__(self, projection: Union[str, FrozenSet[str]] = "lean"):
+        if msgspec is None:
+            raise ImportError("msgspec is required for typed block decoding")
+        excluded = PROJECTIONS[projection] if isinstance(projection, str) else frozenset(projection)
+        if excluded not in self._types_cache:
+            self._types_cache[excluded] = _build_types(excluded)
+        types = self._types_cache[excluded]
+
+        self.excluded = excluded
+        self._block = msgspec.json.Decoder(types["block"])
+        self._transaction = msgspec.json.Decoder(types["transaction"])
+        self._notification = msgspec.json.Decoder(types["notification"])
+        # A batch is split into raw elements; a provider may also reject it with one error object
+        self._batch = msgspec.json.Decoder(Union[List[msgspec.Raw], types["block"]])
+
+    def decode(self, data: bytes):
+        """Decode a getBlock JSON-RPC response."""
+        return self._block.decode(data)
+
+    def decode_transaction(self, data: bytes):
+        """Decode a getTransaction JSON-RPC response."""
+        return self._transaction.decode(data)
+
+    def decode_notification(self, data):
+        """Decode a websocket message carrying a blockNotification."""
+        return self._notification.decode(data)
+
+    def split_batch(self, data: bytes):
+        """Split a JSON-RPC batch response into raw element bytes, or decode a single error reply."""
+        body = self._batch.decode(data)
+        return [bytes(raw) for raw in body] if isinstance(body, list) else body
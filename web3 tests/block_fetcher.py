@@ -0,0 +1,268 @@
+import asyncio
+import itertools
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from rate_limiter import get_rate_limiter, is_throttled
+from block_cache import cache_key
+from rpc_pool import RpcPool
+from fast_json import loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_CONFIG = {"transactionDetails": "full", "rewards": False}
+
+# Blocks with RPC-side instruction parsing, as the quicknode analyzers consume them
+JSON_PARSED_BLOCK_CONFIG = {
+    "encoding": "jsonParsed",
+    "transactionDetails": "full",
+    "maxSupportedTransactionVersion": 0,
+    "rewards": False,
+}
+
+# getBlock errors that will not change on retry: the slot was skipped by the
+# leader, or the block is missing from the node's long-term storage.
+PERMANENT_BLOCK_ERRORS = {-32007, -32009}
+
+
+def is_skipped(response) -> bool:
+    """Whether a getBlock response reports a slot with no block, rather than a failure to fetch it."""
+    error = response.get("error") if response else None
+    return isinstance(error, dict) and error.get("code") in PERMANENT_BLOCK_ERRORS
+
+
+class BlockFetcher:
+    """
+    Fetch getBlock responses concurrently while yielding them in slot order.
+
+    `rpc_url` is either a single endpoint URL or an RpcPool, in which case
+    each request is routed (and optionally hedged) across its endpoints.
+    With a BlockDecoder, responses are decoded into projected structs
+    instead of dicts; the cache still keeps the full raw response.
+    """
+
+    def __init__(self, rpc_url: Union[str, RpcPool], concurrency: int = 16, block_config: Optional[dict] = None,
+                 batch_size: int = 1, max_retries: int = 3, cache=None, decoder=None):
+        self.pool = rpc_url if isinstance(rpc_url, RpcPool) else None
+        self.rpc_url = None if self.pool else rpc_url
+        self.concurrency = max(1, concurrency)
+        self.block_config = block_config or DEFAULT_BLOCK_CONFIG
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._request_ids = itertools.count(1)
+        # Pools apply the limiter of whichever endpoint they route to
+        self.rate_limiter = None if self.pool else get_rate_limiter(rpc_url)
+        self.cache = cache
+        self.cache_key = cache_key(self.block_config)
+        self.decoder = decoder
+
+    def block_payload(self, slot: int, request_id: int = 1) -> dict:
+        """Build the JSON-RPC getBlock request for a slot."""
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": "getBlock",
+            "params": [slot, self.block_config]
+        }
+
+    def decode_response(self, data: bytes):
+        """Decode a raw getBlock response with the configured decoder, or as plain JSON."""
+        return self.decoder.decode(data) if self.decoder else loads(data)
+
+    def _cached(self, slot: int) -> Optional[dict]:
+        if not self.cache:
+            return None
+        data = self.cache.get(slot, self.cache_key)
+        return self.decode_response(data) if data is not None else None
+
+    def _store(self, slot: int, item: dict, raw: Optional[bytes] = None):
+        # Only successful responses are cached; errors such as skipped slots are not
+        if self.cache and item.get("result") is not None:
+            self.cache.put(slot, self.cache_key, raw if raw is not None else item)
+
+    def fetch_block_sync(self, slot: int) -> Optional[dict]:
+        """
+        Fetch a block by its slot number (blocking).
+
+        Throttled, failed and transient error responses are retried like
+        batch elements; returns None once retries run out. Permanent errors
+        (skipped or missing slots) are returned as they are.
+        """
+        cached = self._cached(slot)
+        if cached is not None:
+            return cached
+
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                logger.info(f"Retrying block {slot} (attempt {attempt})")
+            try:
+                response, body = self._post(self.block_payload(slot), decode=self.decode_response)
+            except requests.RequestException as e:
+                error = e
+                continue
+            if body is None:
+                error = response.status_code if response is not None else 'no response'
+                continue
+            if "error" in body and body["error"].get("code") not in PERMANENT_BLOCK_ERRORS:
+                error = body["error"]
+                continue
+            self._store(slot, body, response.content)
+            return body
+
+        logger.error(f"Failed to fetch block {slot}: {error}")
+        return None
+
+    def _post(self, payload, count: int = 1, decode=loads):
+        """POST to the pool or the single endpoint; returns (response, body) with body None on failure."""
+        if self.pool:
+            return self.pool.post(payload, "getBlock", count, decode)
+
+        self.rate_limiter.acquire("getBlock", count=count)
+        response = self.session.post(self.rpc_url, json=payload)
+        body = decode(response.content) if response.status_code == 200 else None
+        self.rate_limiter.record_response(response.status_code, body, response.headers.get("Retry-After"))
+        return response, body
+
+    def _post_batch(self, slots: List[int]) -> Dict[int, Tuple[dict, Optional[bytes]]]:
+        """Send one JSON-RPC array request and map the (response, raw bytes) back to slots by id."""
+        ids = {}
+        payload = []
+        for slot in slots:
+            request_id = next(self._request_ids)
+            ids[request_id] = slot
+            payload.append(self.block_payload(slot, request_id))
+
+        try:
+            response, body = self._post(payload, count=len(slots),
+                                        decode=self.decoder.split_batch if self.decoder else loads)
+        except requests.RequestException as e:
+            logger.error(f"Batch request for {len(slots)} blocks failed: {e}")
+            return {}
+        if body is None:
+            status = response.status_code if response is not None else 'no response'
+            logger.error(f"Batch request for {len(slots)} blocks failed: {status}")
+            return {}
+
+        if not isinstance(body, list):
+            # Some providers answer a whole batch with a single error object
+            logger.error(f"Batch request rejected: {body.get('error') if isinstance(body, dict) else body}")
+            return {}
+
+        results = {}
+        throttled = False
+        for item in body:
+            # Decoder batches arrive as raw elements so each can be cached unprojected
+            raw = item if self.decoder else None
+            if raw is not None:
+                item = self.decoder.decode(raw)
+                throttled = throttled or is_throttled(200, item)
+            slot = ids.get(item.get("id"))
+            if slot is not None:
+                results[slot] = item, raw
+        if throttled:
+            # The limiter only saw the raw elements, so report the -32005 errors here
+            if self.pool:
+                self.pool.record_throttled(response)
+            else:
+                self.rate_limiter.on_throttled()
+        return results
+
+    def fetch_blocks_sync(self, slots: List[int]) -> Dict[int, Optional[dict]]:
+        """
+        Fetch several blocks in one JSON-RPC batch (blocking).
+
+        Elements that fail with a transient error, or are missing from the
+        response, are retried on their own; the rest of the batch is kept.
+        """
+        results = {slot: self._cached(slot) for slot in slots}
+        pending = [slot for slot in slots if results[slot] is None]
+
+        for attempt in range(self.max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                logger.info(f"Retrying {len(pending)} of {len(slots)} blocks (attempt {attempt})")
+
+            responses = self._post_batch(pending)
+            retry = []
+            for slot in pending:
+                item, raw = responses.get(slot, (None, None))
+                if item is None:
+                    retry.append(slot)
+                elif "error" in item and item["error"].get("code") not in PERMANENT_BLOCK_ERRORS:
+                    results[slot] = item
+                    retry.append(slot)
+                else:
+                    results[slot] = item
+                    self._store(slot, item, raw)
+            pending = retry
+
+        for slot in pending:
+            logger.error(f"Failed to fetch block {slot}: {results[slot] and results[slot].get('error')}")
+            results[slot] = None
+        return results
+
+    async def fetch_block(self, slot: int) -> Optional[dict]:
+        """Fetch a block on the fetcher's thread pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.fetch_block_sync, slot)
+
+    async def fetch_blocks(self, slots: List[int]) -> Dict[int, Optional[dict]]:
+        """Fetch a batch of blocks without blocking the event loop."""
+        if len(slots) == 1:
+            return {slots[0]: await self.fetch_block(slots[0])}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.fetch_blocks_sync, slots)
+
+    async def iter_blocks(self, start_slot: int, end_slot: int) -> AsyncIterator[Tuple[int, Optional[dict]]]:
+        """
+        Yield (slot, block_data) for every slot in [start_slot, end_slot] in slot order.
+
+        Slots are requested in batches of `batch_size` with up to `concurrency`
+        requests in flight; a finished block is only handed out once every
+        lower slot has been handed out.
+        """
+        in_flight = deque()
+        next_slot = start_slot
+
+        try:
+            while next_slot <= end_slot or in_flight:
+                while next_slot <= end_slot and len(in_flight) < self.concurrency:
+                    batch = list(range(next_slot, min(next_slot + self.batch_size, end_slot + 1)))
+                    in_flight.append((batch, asyncio.create_task(self.fetch_blocks(batch))))
+                    next_slot = batch[-1] + 1
+
+                batch, task = in_flight.popleft()
+                blocks = await task
+                for slot in batch:
+                    yield slot, blocks.get(slot)
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+
+    def close(self):
+        """Release pooled connections and worker threads."""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+def fetch_block_json(rpc_url: Union[str, RpcPool], slot: int, block_config: Optional[dict] = None,
+                     decoder=None) -> Optional[dict]:
+    """Fetch one block as decoded JSON (the getBlock `result`), or None if unavailable."""
+    fetcher = BlockFetcher(rpc_url, concurrency=1, block_config=block_config or JSON_PARSED_BLOCK_CONFIG,
+                           decoder=decoder)
+    try:
+        response = fetcher.fetch_block_sync(slot)
+    finally:
+        fetcher.close()
+    return response.get("result") if response else None
@@ -1,35 +1,38 @@
 import asyncio
 import json
 import logging
-import requests
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional
 from models import BaseTransaction, SwapEvent, MintEvent, BurnEvent
+from block_fetcher import BlockFetcher, is_skipped
+from block_cache import BlockCache
+from block_decoder import BlockDecoder
+from fetch_profiles import get_profile, resolve_profile
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SolanaBlockParser:
-    def __init__(self, rpc_url: str = "https://api.mainnet-beta.solana.com"):
+    # The event parsers match on RPC-parsed instructions ("program"/"parsed")
+    REQUIRED_FIELDS = {"signatures", "blockTime", "computeUnits", "parsedInstructions"}
+
+    def __init__(self, rpc_url: str = "https://api.mainnet-beta.solana.com", concurrency: int = 16,
+                 batch_size: int = 1, cache=None, projection: Optional[str] = None, profile: Optional[str] = None):
         self.rpc_url = rpc_url
+        self.cache = cache
+        self.profile = get_profile(profile) if profile else resolve_profile(self)
+        # The parser only reads messages and compute units, so blocks can be decoded projected
+        self.decoder = BlockDecoder(projection) if projection else None
+        self.fetcher = BlockFetcher(rpc_url, concurrency=concurrency, block_config=self.profile.block_config,
+                                    batch_size=batch_size, cache=cache, decoder=self.decoder)
 
     def fetch_block(self, slot: int):
         """Fetch a block by its slot number."""
-        payload = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "getBlock",
-            "params": [
-                slot,
-                {"transactionDetails": "full", "rewards": False}
-            ]
-        }
-        response = requests.post(self.rpc_url, json=payload)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            logger.error(f"Failed to fetch block {slot}: {response.status_code}")
-            return None
+        return self.fetcher.fetch_block_sync(slot)
+
+    def fetch_blocks(self, slots: List[int]) -> Dict[int, Optional[dict]]:
+        """Fetch several blocks in a single JSON-RPC batch request."""
+        return self.fetcher.fetch_blocks_sync(slots)
 
     def parse_transactions(self, block_data: dict) -> List[dict]:
         """Parse transactions from block data into dictionaries."""
@@ -167,29 +170,54 @@ class SolanaBlockParser:
         return burn_events
 
 
-    async def process_blocks(self, start_slot: int, end_slot: int):
-        """Fetch and process blocks from start_slot to end_slot."""
-        for slot in range(start_slot, end_slot + 1):
-            logger.info(f"Processing block {slot}")
-            block_data = self.fetch_block(slot)
-
-            if not block_data:
-                continue
-
-            transactions = self.parse_transactions(block_data)
-
-            swap_events = self.parse_swap_events(transactions)
-            mint_events = self.parse_mint_events(transactions)
-            burn_events = self.parse_burn_events(transactions)
-
-            # Print or save events as needed
-            logger.info(f"Block {slot} contains {len(transactions)} transactions")
-            logger.info(f"Swap Events: {swap_events}")
-            logger.info(f"Mint Events: {mint_events}")
-            logger.info(f"Burn Events: {burn_events}")
+    def process_block(self, slot: int, block_data: dict):
+        """Parse a fetched block and its events."""
+        transactions = self.parse_transactions(block_data)
+
+        swap_events = self.parse_swap_events(transactions)
+        mint_events = self.parse_mint_events(transactions)
+        burn_events = self.parse_burn_events(transactions)
+
+        # Print or save events as needed
+        logger.info(f"Block {slot} contains {len(transactions)} transactions")
+        logger.info(f"Swap Events: {swap_events}")
+        logger.info(f"Mint Events: {mint_events}")
+        logger.info(f"Burn Events: {burn_events}")
+
+    async def process_blocks(self, start_slot: int, end_slot: int, progress=None, job: str = "block_parser"):
+        """Fetch and process blocks from start_slot to end_slot.
+
+        Blocks are fetched concurrently but processed strictly in slot order.
+        With a progress log (db_setup.ProgressLog), slots the job already
+        completed are skipped and each processed slot is recorded, so an
+        interrupted run resumes where it stopped.
+        """
+        ranges = progress.pending_ranges(job, start_slot, end_slot) if progress else [(start_slot, end_slot)]
+        for range_start, range_end in ranges:
+            async for slot, block_data in self.fetcher.iter_blocks(range_start, range_end):
+                logger.info(f"Processing block {slot}")
+
+                if not block_data:
+                    continue
+                if block_data.get("result") is None:
+                    # A slot without a block is done; any other error leaves it pending
+                    if not is_skipped(block_data):
+                        logger.error(f"Failed to fetch block {slot}: {block_data.get('error')}")
+                        continue
+                else:
+                    self.process_block(slot, block_data)
+                if progress:
+                    progress.mark_completed(job, slot, slot)
+
+    def replay_blocks(self, start_slot: int = 0, end_slot: Optional[int] = None):
+        """Process cached blocks in slot order without touching the RPC endpoint."""
+        blocks = self.cache.replay(self.fetcher.cache_key, start_slot, end_slot, self.fetcher.decode_response)
+        for slot, block_data in blocks:
+            logger.info(f"Replaying block {slot}")
+            self.process_block(slot, block_data)
 
 async def main():
-    parser = SolanaBlockParser()
+    parser = SolanaBlockParser(concurrency=16, batch_size=5, cache=BlockCache("block_cache"), projection="lean")
     start_slot = 150000000  # Example start slot
     end_slot = 150000010  # Example end slot
 
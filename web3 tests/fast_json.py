@@ -0,0 +1,25 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # the stdlib decoder is slower but produces the same objects
+    orjson = None
+
+
+def loads(data):
+    """Decode JSON from bytes or str with orjson when it is installed."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def transaction_json(tx) -> dict:
+    """
+    Return a transaction as plain JSON-RPC dicts.
+
+    Transactions fetched as raw JSON are already dicts and are returned as-is;
+    solders objects (from solana-py's Client) still need the to_json round trip.
+    """
+    if isinstance(tx, dict):
+        return tx
+    return loads(tx.to_json())
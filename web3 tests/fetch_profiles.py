@@ -0,0 +1,96 @@
+from typing import Dict, FrozenSet, Iterable
+
+# Fields an analyzer can declare in its REQUIRED_FIELDS:
+#   signatures         transaction signatures
+#   blockTime          block time and height
+#   accountKeys        account keys of each transaction
+#   fee, err           fee and error/status from the meta
+#   balances           pre/post lamport balances
+#   tokenBalances      pre/post token balances
+#   logs               log messages
+#   computeUnits       computeUnitsConsumed
+#   instructions       top-level and inner instructions (raw or parsed)
+#   parsedInstructions instructions with RPC-side parsing (program, parsed)
+#   decodedInstructions  instructions parsed by instruction_decoder.decode_block, which
+#                        covers System, SPL Token, ComputeBudget and the DEX programs
+#   rawTransaction     the serialized wire transaction
+FIELDS = frozenset({
+    "signatures", "blockTime", "accountKeys", "fee", "err", "balances", "tokenBalances",
+    "logs", "computeUnits", "instructions", "parsedInstructions", "decodedInstructions", "rawTransaction",
+})
+
+_META_FIELDS = {"fee", "err", "balances", "tokenBalances"}
+
+# The "accounts" profile's responses carry transaction.accountKeys and no message;
+# instruction_decoder.decode_block moves them to transaction.message.accountKeys,
+# the shape every consumer reads, so blocks must go through it before analysis.
+
+
+class FetchProfile:
+    """A getBlock request shape and the fields its responses carry."""
+
+    def __init__(self, name: str, block_config: dict, fields: Iterable[str]):
+        self.name = name
+        self.block_config = block_config
+        self.fields = frozenset(fields)
+
+    def covers(self, required: Iterable[str]) -> bool:
+        return self.fields.issuperset(required)
+
+    def __repr__(self):
+        return f"FetchProfile({self.name!r})"
+
+
+# Cheapest first; resolve_profile picks the first one that covers every requirement
+FETCH_PROFILES: Dict[str, FetchProfile] = {profile.name: profile for profile in [
+    FetchProfile("signatures", {
+        "transactionDetails": "signatures",
+        "maxSupportedTransactionVersion": 0,
+        "rewards": False,
+    }, {"signatures", "blockTime"}),
+    FetchProfile("accounts", {
+        "encoding": "jsonParsed",
+        "transactionDetails": "accounts",
+        "maxSupportedTransactionVersion": 0,
+        "rewards": False,
+    }, {"signatures", "blockTime", "accountKeys"} | _META_FIELDS),
+    FetchProfile("full-base64", {
+        "encoding": "base64",
+        "transactionDetails": "full",
+        "maxSupportedTransactionVersion": 0,
+        "rewards": False,
+    }, FIELDS - {"parsedInstructions"}),
+    FetchProfile("full-parsed", {
+        "encoding": "jsonParsed",
+        "transactionDetails": "full",
+        "maxSupportedTransactionVersion": 0,
+        "rewards": False,
+    }, FIELDS - {"rawTransaction"}),
+]}
+
+
+def required_fields(analyzer) -> FrozenSet[str]:
+    """Fields an analyzer needs: its REQUIRED_FIELDS attribute, or the analyzer itself if it is a set of names."""
+    fields = getattr(analyzer, "REQUIRED_FIELDS", analyzer)
+    if isinstance(fields, str):
+        fields = [fields]
+    fields = frozenset(fields)
+    unknown = fields - FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fetch fields {sorted(unknown)}, expected some of {sorted(FIELDS)}")
+    return fields
+
+
+def resolve_profile(*analyzers) -> FetchProfile:
+    """Return the cheapest profile that satisfies every analyzer attached to a pipeline."""
+    required = frozenset().union(*(required_fields(analyzer) for analyzer in analyzers))
+    for profile in FETCH_PROFILES.values():
+        if profile.covers(required):
+            return profile
+    raise ValueError(f"No fetch profile provides {sorted(required)}")
+
+
+def get_profile(name: str) -> FetchProfile:
+    if name not in FETCH_PROFILES:
+        raise ValueError(f"Unknown fetch profile {name!r}, expected one of {list(FETCH_PROFILES)}")
+    return FETCH_PROFILES[name]
@@ -0,0 +1,574 @@
+import base64
+import hashlib
+import re
+import struct
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Program ids with a local decoder
+SYSTEM_PROGRAM = "11111111111111111111111111111111"
+TOKEN_PROGRAM = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+TOKEN_2022_PROGRAM = "TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb"
+COMPUTE_BUDGET_PROGRAM = "ComputeBudget111111111111111111111111111111"
+SERUM_DEX_PROGRAM = "srmqPvymJeFKQ4zGQed1GFppgkRHL9kaELCbyksJtPX"
+RAYDIUM_AMM_PROGRAM = "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8"
+JUPITER_PROGRAM = "JUP4Fb2cqiRUcaTHdrPC8h2gNsA2ETXiPDD33WcGuJB"
+ORCA_WHIRLPOOL_PROGRAM = "whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc"
+TOKEN_SWAP_PROGRAM = "9W959DqEETiGZocYWCQPaJ6sBmUzgfxXfqGeTEdp3aQP"
+
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_B58_INDEX = {c: i for i, c in enumerate(_B58_ALPHABET)}
+
+
+def b58encode(data: bytes) -> str:
+    n = int.from_bytes(data, "big")
+    out = []
+    while n:
+        n, r = divmod(n, 58)
+        out.append(_B58_ALPHABET[r])
+    pad = len(data) - len(data.lstrip(b"\0"))
+    return "1" * pad + "".join(reversed(out))
+
+
+def b58decode(text: str) -> bytes:
+    n = 0
+    for c in text:
+        n = n * 58 + _B58_INDEX[c]
+    pad = len(text) - len(text.lstrip("1"))
+    return b"\0" * pad + n.to_bytes((n.bit_length() + 7) // 8, "big")
+
+
+@lru_cache(maxsize=65536)
+def pubkey(raw: bytes) -> str:
+    """Base58 form of a 32-byte public key; the same few thousand keys recur across blocks."""
+    return b58encode(raw)
+
+
+class Reader:
+    """Little-endian cursor over instruction or message bytes."""
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def take(self, n: int) -> bytes:
+        if self.pos + n > len(self.data):
+            raise ValueError("Unexpected end of data")
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return chunk
+
+    def u8(self) -> int:
+        return self.take(1)[0]
+
+    def u16(self) -> int:
+        return struct.unpack("<H", self.take(2))[0]
+
+    def u32(self) -> int:
+        return struct.unpack("<I", self.take(4))[0]
+
+    def u64(self) -> int:
+        return struct.unpack("<Q", self.take(8))[0]
+
+    def u128(self) -> int:
+        return int.from_bytes(self.take(16), "little")
+
+    def bool(self) -> bool:
+        return self.u8() != 0
+
+    def pubkey(self) -> str:
+        return pubkey(self.take(32))
+
+    def option_pubkey(self) -> Optional[str]:
+        return self.pubkey() if self.u8() else None
+
+    def shortvec(self) -> int:
+        """Compact-u16 length prefix used by the transaction wire format."""
+        value = shift = 0
+        while True:
+            byte = self.u8()
+            value |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return value
+            shift += 7
+
+    def rust_string(self) -> str:
+        return self.take(self.u64()).decode("utf-8", "replace")
+
+    def remaining(self) -> int:
+        return len(self.data) - self.pos
+
+
+# program id -> (program name, decode(reader, accounts) -> (type, info))
+INSTRUCTION_DECODERS: Dict[str, Tuple[str, Callable]] = {}
+
+
+def register_decoder(program_id: str, program: str):
+    """Register an instruction decoder for a program; output follows the jsonParsed `parsed` layout."""
+    def wrap(decode):
+        INSTRUCTION_DECODERS[program_id] = (program, decode)
+        return decode
+    return wrap
+
+
+def _named(accounts: List[str], names) -> dict:
+    return {name: account for name, account in zip(names, accounts) if name}
+
+
+def _ui_amount(amount: int, decimals: int) -> dict:
+    ui = amount / 10 ** decimals
+    ui_string = f"{ui:.{decimals}f}".rstrip("0").rstrip(".") if decimals else str(amount)
+    return {"amount": str(amount), "decimals": decimals, "uiAmount": ui, "uiAmountString": ui_string}
+
+
+# System program
+
+_SYSTEM_ACCOUNTS = {
+    "createAccount": ("source", "newAccount"),
+    "assign": ("account",),
+    "transfer": ("source", "destination"),
+    "createAccountWithSeed": ("source", "newAccount", "base"),
+    "advanceNonce": ("nonceAccount", "recentBlockhashesSysvar", "nonceAuthority"),
+    "withdrawFromNonce": ("nonceAccount", "destination", "recentBlockhashesSysvar", "rentSysvar", "nonceAuthority"),
+    "initializeNonce": ("nonceAccount", "recentBlockhashesSysvar", "rentSysvar"),
+    "authorizeNonce": ("nonceAccount", "nonceAuthority"),
+    "allocate": ("account",),
+    "allocateWithSeed": ("account", "base"),
+    "assignWithSeed": ("account", "base"),
+    "transferWithSeed": ("source", "sourceBase", "destination"),
+    "upgradeNonce": ("nonceAccount",),
+}
+_SYSTEM_TYPES = list(_SYSTEM_ACCOUNTS)
+
+
+@register_decoder(SYSTEM_PROGRAM, "system")
+def decode_system(r: Reader, accounts: List[str]):
+    kind = _SYSTEM_TYPES[r.u32()]
+    info = _named(accounts, _SYSTEM_ACCOUNTS[kind])
+    if kind == "createAccount":
+        info.update(lamports=r.u64(), space=r.u64(), owner=r.pubkey())
+    elif kind == "assign":
+        info["owner"] = r.pubkey()
+    elif kind in ("transfer", "withdrawFromNonce"):
+        info["lamports"] = r.u64()
+    elif kind == "createAccountWithSeed":
+        info.update(base=r.pubkey(), seed=r.rust_string(), lamports=r.u64(), space=r.u64(), owner=r.pubkey())
+    elif kind == "initializeNonce":
+        info["nonceAuthority"] = r.pubkey()
+    elif kind == "authorizeNonce":
+        info["newAuthorized"] = r.pubkey()
+    elif kind == "allocate":
+        info["space"] = r.u64()
+    elif kind == "allocateWithSeed":
+        info.update(base=r.pubkey(), seed=r.rust_string(), space=r.u64(), owner=r.pubkey())
+    elif kind == "assignWithSeed":
+        info.update(base=r.pubkey(), seed=r.rust_string(), owner=r.pubkey())
+    elif kind == "transferWithSeed":
+        info.update(lamports=r.u64(), sourceSeed=r.rust_string(), sourceOwner=r.pubkey())
+    return kind, info
+
+
+# SPL Token (and the instruction subset Token-2022 shares with it)
+
+_TOKEN_TYPES = {
+    0: ("initializeMint", ("mint", "rentSysvar")),
+    1: ("initializeAccount", ("account", "mint", "owner", "rentSysvar")),
+    2: ("initializeMultisig", ("multisig", "rentSysvar")),
+    3: ("transfer", ("source", "destination", "authority")),
+    4: ("approve", ("source", "delegate", "owner")),
+    5: ("revoke", ("source", "owner")),
+    6: ("setAuthority", ("account", "authority")),
+    7: ("mintTo", ("mint", "account", "mintAuthority")),
+    8: ("burn", ("account", "mint", "authority")),
+    9: ("closeAccount", ("account", "destination", "owner")),
+    10: ("freezeAccount", ("account", "mint", "freezeAuthority")),
+    11: ("thawAccount", ("account", "mint", "freezeAuthority")),
+    12: ("transferChecked", ("source", "mint", "destination", "authority")),
+    13: ("approveChecked", ("source", "mint", "delegate", "owner")),
+    14: ("mintToChecked", ("mint", "account", "mintAuthority")),
+    15: ("burnChecked", ("account", "mint", "authority")),
+    16: ("initializeAccount2", ("account", "mint", "rentSysvar")),
+    17: ("syncNative", ("account",)),
+    18: ("initializeAccount3", ("account", "mint")),
+    19: ("initializeMultisig2", ("multisig",)),
+    20: ("initializeMint2", ("mint",)),
+    21: ("getAccountDataSize", ("mint",)),
+    22: ("initializeImmutableOwner", ("account",)),
+    23: ("amountToUiAmount", ("mint",)),
+    24: ("uiAmountToAmount", ("mint",)),
+}
+_AUTHORITY_TYPES = ["mintTokens", "freezeAccount", "accountOwner", "closeAccount"]
+
+
+def decode_token(r: Reader, accounts: List[str]):
+    kind, names = _TOKEN_TYPES[r.u8()]
+    info = _named(accounts, names)
+    if kind in ("initializeMint", "initializeMint2"):
+        info.update(decimals=r.u8(), mintAuthority=r.pubkey())
+        freeze_authority = r.option_pubkey()
+        if freeze_authority:
+            info["freezeAuthority"] = freeze_authority
+    elif kind in ("initializeAccount2", "initializeAccount3"):
+        info["owner"] = r.pubkey()
+    elif kind in ("initializeMultisig", "initializeMultisig2"):
+        info["m"] = r.u8()
+        info["signers"] = accounts[len(names):]
+    elif kind in ("transfer", "approve", "mintTo", "burn"):
+        info["amount"] = str(r.u64())
+    elif kind in ("transferChecked", "approveChecked", "mintToChecked", "burnChecked"):
+        amount = r.u64()
+        info["tokenAmount"] = _ui_amount(amount, r.u8())
+    elif kind == "setAuthority":
+        authority_type = r.u8()
+        info["authorityType"] = _AUTHORITY_TYPES[authority_type] if authority_type < len(_AUTHORITY_TYPES) else authority_type
+        info["newAuthority"] = r.option_pubkey()
+    elif kind == "amountToUiAmount":
+        info["amount"] = str(r.u64())
+    elif kind == "uiAmountToAmount":
+        info["uiAmount"] = r.take(r.remaining()).decode("utf-8", "replace")
+
+    # Multisig authorities list their co-signers after the named accounts
+    if len(accounts) > len(names) and "signers" not in info:
+        info["signers"] = accounts[len(names):]
+    return kind, info
+
+
+register_decoder(TOKEN_PROGRAM, "spl-token")(decode_token)
+register_decoder(TOKEN_2022_PROGRAM, "spl-token")(decode_token)
+
+
+# ComputeBudget (left unparsed by jsonParsed)
+
+@register_decoder(COMPUTE_BUDGET_PROGRAM, "compute-budget")
+def decode_compute_budget(r: Reader, accounts: List[str]):
+    tag = r.u8()
+    if tag == 0:
+        return "requestUnits", {"units": r.u32(), "additionalFee": r.u32()}
+    if tag == 1:
+        return "requestHeapFrame", {"bytes": r.u32()}
+    if tag == 2:
+        return "setComputeUnitLimit", {"units": r.u32()}
+    if tag == 3:
+        return "setComputeUnitPrice", {"microLamports": r.u64()}
+    if tag == 4:
+        return "setLoadedAccountsDataSizeLimit", {"bytes": r.u32()}
+    raise ValueError(f"Unknown ComputeBudget instruction {tag}")
+
+
+# DEX programs (parsing.DEX_PROGRAMS)
+
+def _snake(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def anchor_discriminators(names) -> Dict[bytes, str]:
+    """Map Anchor's 8-byte instruction discriminators (sha256("global:<name>")) to camelCase names."""
+    return {hashlib.sha256(f"global:{_snake(name)}".encode()).digest()[:8]: name for name in names}
+
+
+_SERUM_TYPES = [
+    "initializeMarket", "newOrder", "matchOrders", "consumeEvents", "cancelOrder", "settleFunds",
+    "cancelOrderByClientId", "disableMarket", "sweepFees", "newOrderV2", "newOrderV3", "cancelOrderV2",
+    "cancelOrderByClientIdV2", "sendTake", "closeOpenOrders", "initOpenOrders", "prune",
+    "consumeEventsPermissioned", "cancelOrdersByClientIds", "replaceOrderByClientId", "replaceOrdersByClientIds",
+]
+
+
+@register_decoder(SERUM_DEX_PROGRAM, "serum-dex")
+def decode_serum(r: Reader, accounts: List[str]):
+    r.u8()  # layout version
+    kind = _SERUM_TYPES[r.u32()]
+    info = _named(accounts, ("market", "openOrders"))
+    if kind == "newOrderV3":
+        info.update(side="sell" if r.u32() else "buy", limitPrice=r.u64(), maxCoinQty=r.u64(),
+                    maxNativePcQtyIncludingFees=r.u64(), selfTradeBehavior=r.u32(), orderType=r.u32(),
+                    clientOrderId=r.u64(), limit=r.u16())
+    elif kind == "cancelOrderV2":
+        info.update(side="sell" if r.u32() else "buy", orderId=str(r.u128()))
+    return kind, info
+
+
+_RAYDIUM_TYPES = [
+    "initialize", "initialize2", "monitorStep", "deposit", "withdraw", "migrateToOpenBook", "setParams",
+    "withdrawPnl", "withdrawSrm", "swapBaseIn", "preInitialize", "swapBaseOut", "simulateInfo",
+    "adminCancelOrders", "createConfigAccount", "updateConfigAccount",
+]
+
+
+@register_decoder(RAYDIUM_AMM_PROGRAM, "raydium-amm")
+def decode_raydium(r: Reader, accounts: List[str]):
+    kind = _RAYDIUM_TYPES[r.u8()]
+    info = {}
+    if kind in ("swapBaseIn", "swapBaseOut"):
+        info["amm"] = accounts[1] if len(accounts) > 1 else None
+        # The user's accounts always close the list, whether or not target orders are passed
+        info.update(_named(accounts[-3:], ("userSourceTokenAccount", "userDestinationTokenAccount", "userOwner")))
+        if kind == "swapBaseIn":
+            info.update(amountIn=r.u64(), minimumAmountOut=r.u64())
+        else:
+            info.update(maxAmountIn=r.u64(), amountOut=r.u64())
+    elif kind in ("deposit", "withdraw"):
+        info["amm"] = accounts[1] if len(accounts) > 1 else None
+        if kind == "deposit":
+            info.update(maxCoinAmount=r.u64(), maxPcAmount=r.u64(), baseSide=r.u64())
+        else:
+            info["amount"] = r.u64()
+    return kind, info
+
+
+_JUPITER_TYPES = anchor_discriminators([
+    "route", "routeWithTokenLedger", "sharedAccountsRoute", "sharedAccountsRouteWithTokenLedger",
+    "exactOutRoute", "sharedAccountsExactOutRoute", "setTokenLedger", "createOpenOrders",
+    "createTokenAccount", "claim", "claimToken", "whirlpoolSwapExactOutput", "raydiumSwapExactOutput",
+    "raydiumClmmSwapExactOutput",
+])
+
+
+@register_decoder(JUPITER_PROGRAM, "jupiter")
+def decode_jupiter(r: Reader, accounts: List[str]):
+    kind = _JUPITER_TYPES[r.take(8)]
+    info = {}
+    # Route plans are variable length, but the amounts always trail them
+    if kind in ("route", "sharedAccountsRoute", "exactOutRoute", "sharedAccountsExactOutRoute") and r.remaining() >= 19:
+        r.pos = len(r.data) - 19
+        first, second = r.u64(), r.u64()
+        if "ExactOut" in kind or kind == "exactOutRoute":
+            info.update(outAmount=first, quotedInAmount=second)
+        else:
+            info.update(inAmount=first, quotedOutAmount=second)
+        info.update(slippageBps=r.u16(), platformFeeBps=r.u8())
+    return kind, info
+
+
+_WHIRLPOOL_TYPES = anchor_discriminators([
+    "initializeConfig", "initializePool", "initializeTickArray", "initializeFeeTier", "initializeReward",
+    "setRewardEmissions", "openPosition", "openPositionWithMetadata", "increaseLiquidity", "decreaseLiquidity",
+    "updateFeesAndRewards", "collectFees", "collectReward", "collectProtocolFees", "swap", "closePosition",
+    "setDefaultFeeRate", "setDefaultProtocolFeeRate", "setFeeRate", "setProtocolFeeRate", "twoHopSwap",
+    "initializePositionBundle", "openBundledPosition", "closeBundledPosition", "swapV2", "twoHopSwapV2",
+    "increaseLiquidityV2", "decreaseLiquidityV2", "collectFeesV2", "collectRewardV2", "initializePoolV2",
+])
+
+
+@register_decoder(ORCA_WHIRLPOOL_PROGRAM, "orca-whirlpool")
+def decode_whirlpool(r: Reader, accounts: List[str]):
+    kind = _WHIRLPOOL_TYPES[r.take(8)]
+    info = {}
+    if kind == "swap":
+        info = _named(accounts, ("tokenProgram", "tokenAuthority", "whirlpool", "tokenOwnerAccountA", "tokenVaultA",
+                                 "tokenOwnerAccountB", "tokenVaultB"))
+    elif kind == "swapV2":
+        info = _named(accounts, ("tokenProgramA", "tokenProgramB", "memoProgram", "tokenAuthority", "whirlpool",
+                                 "tokenMintA", "tokenMintB", "tokenOwnerAccountA", "tokenVaultA",
+                                 "tokenOwnerAccountB", "tokenVaultB"))
+    if kind in ("swap", "swapV2"):
+        info.update(amount=r.u64(), otherAmountThreshold=r.u64(), sqrtPriceLimit=str(r.u128()),
+                    amountSpecifiedIsInput=r.bool(), aToB=r.bool())
+    elif kind in ("twoHopSwap", "twoHopSwapV2"):
+        info.update(amount=r.u64(), otherAmountThreshold=r.u64(), amountSpecifiedIsInput=r.bool(),
+                    aToBOne=r.bool(), aToBTwo=r.bool())
+    elif kind in ("increaseLiquidity", "increaseLiquidityV2"):
+        info.update(liquidityAmount=str(r.u128()), tokenMaxA=r.u64(), tokenMaxB=r.u64())
+    elif kind in ("decreaseLiquidity", "decreaseLiquidityV2"):
+        info.update(liquidityAmount=str(r.u128()), tokenMinA=r.u64(), tokenMinB=r.u64())
+    return kind, info
+
+
+_TOKEN_SWAP_TYPES = [
+    "initialize", "swap", "depositAllTokenTypes", "withdrawAllTokenTypes",
+    "depositSingleTokenTypeExactAmountIn", "withdrawSingleTokenTypeExactAmountOut",
+]
+
+
+@register_decoder(TOKEN_SWAP_PROGRAM, "spl-token-swap")
+def decode_token_swap(r: Reader, accounts: List[str]):
+    kind = _TOKEN_SWAP_TYPES[r.u8()]
+    info = {}
+    if kind == "swap":
+        info = _named(accounts, ("swap", "authority", "userTransferAuthority", "source", "swapSource",
+                                 "swapDestination", "destination", "poolMint", "feeAccount", "tokenProgram"))
+        info.update(amountIn=r.u64(), minimumAmountOut=r.u64())
+    return kind, info
+
+
+# Instructions and transactions
+
+def decode_instruction(program_id: str, data: bytes, accounts: List[str],
+                       stack_height: Optional[int] = None) -> dict:
+    """
+    Decode one instruction into the jsonParsed layout.
+
+    Programs with a registered decoder come back as {"program", "programId",
+    "parsed": {"type", "info"}}; anything else, including data a decoder
+    does not understand, keeps the raw {"programId", "accounts", "data"} form.
+    """
+    decoder = INSTRUCTION_DECODERS.get(program_id)
+    if decoder:
+        program, decode = decoder
+        try:
+            kind, info = decode(Reader(data), accounts)
+            return {"program": program, "programId": program_id, "parsed": {"type": kind, "info": info},
+                    "stackHeight": stack_height}
+        except (ValueError, KeyError, IndexError, struct.error):
+            pass
+    return {"programId": program_id, "accounts": accounts, "data": b58encode(data), "stackHeight": stack_height}
+
+
+def parse_message(data: bytes, offset: int = 0) -> dict:
+    """Parse a legacy or v0 wire message into header, keys, blockhash, instructions and lookups."""
+    r = Reader(data, offset)
+    prefix = data[offset]
+    version = "legacy"
+    if prefix & 0x80:
+        version = prefix & 0x7f
+        r.u8()
+
+    header = (r.u8(), r.u8(), r.u8())
+    keys = [r.pubkey() for _ in range(r.shortvec())]
+    blockhash = pubkey(r.take(32))
+    instructions = []
+    for _ in range(r.shortvec()):
+        program_index = r.u8()
+        account_indexes = list(r.take(r.shortvec()))
+        instructions.append((program_index, account_indexes, r.take(r.shortvec())))
+
+    lookups = []
+    if version != "legacy":
+        for _ in range(r.shortvec()):
+            lookups.append({
+                "accountKey": r.pubkey(),
+                "writableIndexes": list(r.take(r.shortvec())),
+                "readonlyIndexes": list(r.take(r.shortvec())),
+            })
+    return {"version": version, "header": header, "accountKeys": keys, "recentBlockhash": blockhash,
+            "instructions": instructions, "addressTableLookups": lookups}
+
+
+def parse_wire_transaction(data: bytes) -> Tuple[List[str], dict]:
+    """Split a serialized transaction into its signatures and parsed message."""
+    r = Reader(data)
+    signatures = [b58encode(r.take(64)) for _ in range(r.shortvec())]
+    return signatures, parse_message(data, r.pos)
+
+
+def _fields(obj) -> dict:
+    """Shallow dict view of a decoded JSON object or msgspec struct."""
+    if obj is None or isinstance(obj, dict):
+        return dict(obj or {})
+    return {name: getattr(obj, name) for name in obj.__struct_fields__}
+
+
+def _account_keys(message: dict, loaded) -> List[dict]:
+    """Account keys with signer/writable flags, static keys first, then table-loaded ones."""
+    required, readonly_signed, readonly_unsigned = message["header"]
+    static = message["accountKeys"]
+    keys = []
+    for i, key in enumerate(static):
+        if i < required:
+            writable = i < required - readonly_signed
+        else:
+            writable = i < len(static) - readonly_unsigned
+        keys.append({"pubkey": key, "signer": i < required, "writable": writable, "source": "transaction"})
+    loaded = loaded or {}
+    for key in loaded.get("writable") or []:
+        keys.append({"pubkey": key, "signer": False, "writable": True, "source": "lookupTable"})
+    for key in loaded.get("readonly") or []:
+        keys.append({"pubkey": key, "signer": False, "writable": False, "source": "lookupTable"})
+    return keys
+
+
+def _resolve(keys: List[str], indexes) -> List[Optional[str]]:
+    return [keys[i] if i < len(keys) else None for i in indexes]
+
+
+def decode_transaction(tx) -> dict:
+    """
+    Turn a base64-encoded getBlock/getTransaction entry into the jsonParsed shape.
+
+    Entries that are already JSON objects (json/jsonParsed encodings) are passed
+    through, with any unparsed instruction of a known program decoded locally.
+    """
+    tx = _fields(tx)
+    transaction = tx.get("transaction")
+    if not isinstance(transaction, (list, tuple)):
+        return _enrich(tx)
+
+    data, encoding = transaction
+    if encoding != "base64":
+        raise ValueError(f"Unsupported transaction encoding {encoding!r}")
+    signatures, message = parse_wire_transaction(base64.b64decode(data))
+
+    meta = _fields(tx.get("meta")) if tx.get("meta") is not None else None
+    account_keys = _account_keys(message, meta.get("loadedAddresses") if meta else None)
+    keys = [key["pubkey"] for key in account_keys]
+
+    instructions = [
+        decode_instruction(keys[program_index], data, _resolve(keys, account_indexes))
+        for program_index, account_indexes, data in message["instructions"]
+    ]
+
+    if meta and meta.get("innerInstructions"):
+        meta["innerInstructions"] = [
+            {
+                "index": inner.get("index"),
+                "instructions": [
+                    decode_instruction(keys[ix.get("programIdIndex")], b58decode(ix.get("data") or ""),
+                                       _resolve(keys, ix.get("accounts") or []), ix.get("stackHeight"))
+                    for ix in inner.get("instructions") or []
+                ],
+            }
+            for inner in meta["innerInstructions"]
+        ]
+
+    decoded_message = {"accountKeys": account_keys, "instructions": instructions,
+                       "recentBlockhash": message["recentBlockhash"]}
+    if message["version"] != "legacy":
+        decoded_message["addressTableLookups"] = message["addressTableLookups"]
+
+    return {
+        "transaction": {"signatures": signatures, "message": decoded_message},
+        "meta": meta,
+        "version": tx.get("version", message["version"]),
+    }
+
+
+def _enrich_instruction(ix):
+    if ix.get("parsed") is not None or ix.get("programId") not in INSTRUCTION_DECODERS:
+        return ix
+    try:
+        data = b58decode(ix.get("data") or "")
+    except KeyError:
+        return ix
+    return decode_instruction(ix.get("programId"), data, list(ix.get("accounts") or []), ix.get("stackHeight"))
+
+
+def _enrich(tx: dict) -> dict:
+    """Locally decode unparsed instructions of a jsonParsed transaction."""
+    transaction = _fields(tx.get("transaction"))
+    message = _fields(transaction.get("message"))
+    if not message:
+        if transaction.get("accountKeys") is None:
+            return tx
+        # transactionDetails "accounts" lists the keys beside the message; move them where consumers look
+        transaction["message"] = {"accountKeys": transaction.pop("accountKeys"), "instructions": []}
+        return {**tx, "transaction": transaction}
+    message["instructions"] = [_enrich_instruction(ix) for ix in message.get("instructions") or []]
+    transaction["message"] = message
+
+    meta = tx.get("meta")
+    if meta is not None and meta.get("innerInstructions"):
+        meta = _fields(meta)
+        meta["innerInstructions"] = [
+            {"index": inner.get("index"),
+             "instructions": [_enrich_instruction(ix) for ix in inner.get("instructions") or []]}
+            for inner in meta["innerInstructions"]
+        ]
+    return {**tx, "transaction": transaction, "meta": meta}
+
+
+def decode_block(block) -> dict:
+    """Return a block whose transactions are in the jsonParsed shape the analyzers read."""
+    block = _fields(block)
+    if block.get("transactions"):
+        block["transactions"] = [decode_transaction(tx) for tx in block["transactions"]]
+    return block
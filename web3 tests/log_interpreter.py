@@ -0,0 +1,63 @@
+from typing import Iterable, List, Optional
+
+INSTRUCTION_PREFIX = "Program log: Instruction: "
+
+
+class Invocation:
+    """One program invocation reconstructed from a transaction's log messages."""
+
+    __slots__ = ("program_id", "depth", "parent", "instructions", "compute_units", "success")
+
+    def __init__(self, program_id: str, depth: int, parent: Optional["Invocation"]):
+        self.program_id = program_id
+        self.depth = depth
+        self.parent = parent
+        self.instructions: List[str] = []
+        self.compute_units: Optional[int] = None
+        self.success: Optional[bool] = None
+
+    @property
+    def instruction(self) -> Optional[str]:
+        return self.instructions[0] if self.instructions else None
+
+    def __repr__(self):
+        return f"Invocation({self.program_id!r}, depth={self.depth}, instructions={self.instructions})"
+
+
+def interpret_logs(log_messages: Iterable[str]) -> List[Invocation]:
+    """
+    Replay the runtime's invoke/success log lines in a single pass.
+
+    Returns every invocation in the order it started, each with its depth,
+    calling invocation, the `Instruction:` names it logged, the compute
+    units it reported and whether it succeeded. Lines after "Log truncated"
+    can't be attributed and are ignored.
+    """
+    invocations = []
+    stack = []
+    for line in log_messages or ():
+        if line.startswith(INSTRUCTION_PREFIX):
+            if stack:
+                stack[-1].instructions.append(line[len(INSTRUCTION_PREFIX):].strip())
+            continue
+        if not line.startswith("Program ") or line.startswith("Program log:") or line.startswith("Program data:"):
+            if line == "Log truncated":
+                break
+            continue
+
+        parts = line.split(" ", 3)
+        if len(parts) < 3:
+            continue
+        program_id, action = parts[1], parts[2]
+        if action == "invoke":
+            invocation = Invocation(program_id, len(stack) + 1, stack[-1] if stack else None)
+            invocations.append(invocation)
+            stack.append(invocation)
+        elif action == "consumed":
+            # "Program <id> consumed <units> of <limit> compute units"
+            if stack and len(parts) == 4:
+                stack[-1].compute_units = int(parts[3].split(" ", 1)[0])
+        elif action in ("success", "failed:"):
+            if stack:
+                stack.pop().success = action == "success"
+    return invocations
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import time
+from typing import Optional, Tuple
+
+OVERFLOW_POLICIES = ("block", "drop-oldest", "spill")
+
+
+class MessageQueue:
+    """
+    Bounded queue between the websocket reader and the processing workers.
+
+    When the queue is full the overflow policy decides what happens:
+      block        the reader waits, pushing backpressure onto the socket
+      drop-oldest  the oldest queued message is discarded to make room
+      spill        messages go to an append-only file and are read back
+                   in order once the workers catch up
+    """
+
+    def __init__(self, maxsize: int = 1000, overflow: str = "block", spill_path: Optional[str] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
+        if overflow == "spill" and not spill_path:
+            raise ValueError("The spill overflow policy needs a spill_path")
+
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.spill_pending = 0
+        self._spill_offset = 0
+
+        self.enqueued = 0
+        self.dequeued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.max_depth = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    async def put(self, message) -> None:
+        """Queue a message, applying the overflow policy if the queue is full."""
+        item = (message, time.monotonic())
+        self.enqueued += 1
+
+        if self.overflow == "block":
+            await self.queue.put(item)
+        elif self.overflow == "drop-oldest":
+            if self.queue.full():
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+            self.queue.put_nowait(item)
+        elif self.spill_pending or self.queue.full():
+            # Once anything is on disk, later messages follow it there to keep order
+            self._spill(item)
+        else:
+            self.queue.put_nowait(item)
+
+        self.max_depth = max(self.max_depth, self.depth)
+
+    async def get(self) -> Tuple[object, float]:
+        """Return the next message and how long it waited in the queue."""
+        message, enqueued_at = await self.queue.get()
+        self._refill()
+
+        lag = time.monotonic() - enqueued_at
+        self.dequeued += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        return message, lag
+
+    def task_done(self) -> None:
+        self.processed += 1
+        self.queue.task_done()
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() + self.spill_pending
+
+    def _spill(self, item) -> None:
+        message, enqueued_at = item
+        with open(self.spill_path, "a") as f:
+            f.write(json.dumps([message, enqueued_at]) + "\n")
+        self.spill_pending += 1
+        self.spilled += 1
+
+    def _refill(self) -> None:
+        """Move spilled messages back into memory while there is room."""
+        if not self.spill_pending or self.queue.full():
+            return
+
+        with open(self.spill_path) as f:
+            f.seek(self._spill_offset)
+            while self.spill_pending and not self.queue.full():
+                line = f.readline()
+                if not line:
+                    break
+                message, enqueued_at = json.loads(line)
+                self.queue.put_nowait((message, enqueued_at))
+                self.spill_pending -= 1
+            self._spill_offset = f.tell()
+
+        if not self.spill_pending:
+            os.remove(self.spill_path)
+            self._spill_offset = 0
+
+    def stats(self) -> dict:
+        """Queue depth, throughput and lag metrics."""
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'spill_pending': self.spill_pending,
+            'enqueued': self.enqueued,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'avg_lag': self.total_lag / self.dequeued if self.dequeued else 0.0,
+            'max_lag': self.max_lag,
+        }
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+
+class _Bucket:
+    """Token bucket that hands out reservations instead of blocking."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, cost: float, rate: float, now: float) -> float:
+        """Take `cost` tokens (possibly going into debt) and return the wait in seconds."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        self.tokens -= cost
+        return 0.0 if self.tokens >= 0 else -self.tokens / rate
+
+
+class RateLimiter:
+    """
+    Adaptive token-bucket limiter for one endpoint, shared by sync and async callers.
+
+    Each call reserves one request token and `cost` credits. When the provider
+    answers with HTTP 429 or JSON-RPC -32005 the effective rate is halved
+    (and optionally paused for Retry-After); every successful call then
+    restores a small fraction of the configured rate until it is back to full.
+    """
+
+    def __init__(self, requests_per_second: float, credits_per_second: Optional[float] = None,
+                 method_credits: Optional[Dict[str, float]] = None, min_scale: float = 0.05,
+                 recovery_step: float = 0.02):
+        self.requests_per_second = requests_per_second
+        self.credits_per_second = credits_per_second
+        self.method_credits = method_credits or {}
+        self.min_scale = min_scale
+        self.recovery_step = recovery_step
+
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.throttled_count = 0
+        self._requests = _Bucket(requests_per_second)
+        self._credits = _Bucket(credits_per_second) if credits_per_second else None
+        self._lock = threading.Lock()
+
+    def _reserve(self, method: Optional[str], count: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = self._requests.reserve(count, self.requests_per_second * self.scale, now)
+            if self._credits:
+                cost = self.method_credits.get(method, 1) * count
+                wait = max(wait, self._credits.reserve(cost, self.credits_per_second * self.scale, now))
+            return max(wait, self.paused_until - now)
+
+    def acquire(self, method: Optional[str] = None, count: int = 1) -> None:
+        """Block the calling thread until `count` calls of `method` may be sent."""
+        wait = self._reserve(method, count)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, method: Optional[str] = None, count: int = 1) -> None:
+        """Wait on the event loop until `count` calls of `method` may be sent."""
+        wait = self._reserve(method, count)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_throttled(self, retry_after: Optional[float] = None) -> None:
+        """Back off after the provider rejected a call for exceeding its limits."""
+        with self._lock:
+            self.throttled_count += 1
+            self.scale = max(self.min_scale, self.scale * 0.5)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def on_success(self) -> None:
+        """Recover towards the configured rate after a successful call."""
+        if self.scale < 1.0:
+            with self._lock:
+                self.scale = min(1.0, self.scale + self.recovery_step)
+
+    def record_response(self, status_code: int, body=None, retry_after: Optional[str] = None) -> bool:
+        """Update the limiter from an HTTP response; returns True if it was throttled."""
+        if is_throttled(status_code, body):
+            self.on_throttled(float(retry_after) if retry_after and retry_after.isdigit() else None)
+            return True
+        self.on_success()
+        return False
+
+
+def is_throttled(status_code: int, body=None) -> bool:
+    """Check for HTTP 429 or a JSON-RPC -32005 (limit exceeded) error in a response."""
+    if status_code == 429:
+        return True
+    items = body if isinstance(body, list) else [body]
+    for item in items:
+        # Typed decoders return structs that answer .get() like the raw dicts
+        if hasattr(item, "get") and isinstance(item.get("error"), dict) and item["error"].get("code") == -32005:
+            return True
+    return False
+
+
+# Limiters are shared per endpoint so every caller in the process draws from the same budget
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+DEFAULT_REQUESTS_PER_SECOND = 10
+
+
+def configure_endpoint(url: str, requests_per_second: float, credits_per_second: Optional[float] = None,
+                       method_credits: Optional[Dict[str, float]] = None) -> RateLimiter:
+    """Set the request and credit budget for an endpoint, replacing any existing limiter."""
+    limiter = RateLimiter(requests_per_second, credits_per_second, method_credits)
+    with _limiters_lock:
+        _limiters[url] = limiter
+    return limiter
+
+
+def get_rate_limiter(url: str) -> RateLimiter:
+    """Return the shared limiter for an endpoint, creating one with default limits if needed."""
+    with _limiters_lock:
+        if url not in _limiters:
+            _limiters[url] = RateLimiter(DEFAULT_REQUESTS_PER_SECOND)
+        return _limiters[url]
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from rate_limiter import get_rate_limiter, is_throttled
+from fast_json import loads
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointStats:
+    """Rolling latency samples and error rate for one RPC endpoint."""
+
+    def __init__(self, url: str, window: int = 200, error_decay: float = 0.05):
+        self.url = url
+        self.latencies = deque(maxlen=window)
+        self.error_decay = error_decay
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.last_used = 0.0
+
+    def record(self, latency: float, ok: bool):
+        self.requests += 1
+        self.last_used = time.monotonic()
+        if ok:
+            self.latencies.append(latency)
+            self.error_rate -= self.error_decay * self.error_rate
+        else:
+            self.record_error()
+
+    def record_error(self):
+        self.errors += 1
+        self.error_rate += self.error_decay * (1.0 - self.error_rate)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(0.50)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(0.99)
+
+    def score(self) -> float:
+        """Lower is better: median latency inflated by recent errors."""
+        # The flat error term ranks an endpoint that only ever fails (no latency samples) last
+        return self.p50 * (1 + 10 * self.error_rate) + self.error_rate
+
+
+class RpcPool:
+    """
+    Route JSON-RPC calls across several endpoints by observed latency and errors.
+
+    Calls go to the endpoint with the best score and fail over to the next
+    one on transport errors or non-200 responses. For methods in
+    `hedge_methods`, if the first endpoint hasn't answered within
+    `hedge_after` seconds, the same request is sent to the next best
+    endpoint and whichever good answer arrives first is used.
+    """
+
+    def __init__(self, urls: List[str], hedge_after: Optional[float] = None, hedge_methods=("getBlock",),
+                 timeout: float = 30, max_workers: int = 32, explore_every: int = 100):
+        if not urls:
+            raise ValueError("RpcPool needs at least one endpoint")
+        self.endpoints = [EndpointStats(url) for url in urls]
+        self.hedge_after = hedge_after
+        self.hedge_methods = set(hedge_methods)
+        self.timeout = timeout
+        self.explore_every = explore_every
+        self.hedged = 0
+        self.hedge_wins = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def ranked(self) -> List[EndpointStats]:
+        """Endpoints from best to worst; periodically the stalest one is tried first."""
+        with self._lock:
+            self._calls += 1
+            explore = self.explore_every and self._calls % self.explore_every == 0
+        ranked = sorted(self.endpoints, key=EndpointStats.score)
+        if explore and len(ranked) > 1:
+            stalest = min(ranked, key=lambda e: e.last_used)
+            ranked.remove(stalest)
+            ranked.insert(0, stalest)
+        return ranked
+
+    def _send(self, endpoint: EndpointStats, payload, method: Optional[str], count: int, decode=None):
+        """
+        Send one request to one endpoint; returns (response, body) with body None on failure.
+
+        A batch only fails as a whole on a transport or HTTP error; throttled
+        elements are left in the body for the caller to retry.
+        """
+        limiter = get_rate_limiter(endpoint.url)
+        limiter.acquire(method, count=count)
+        start = time.monotonic()
+        try:
+            response = self.session.post(endpoint.url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            endpoint.record(time.monotonic() - start, False)
+            logger.warning(f"{endpoint.url} failed: {e}")
+            return None, None
+
+        body = (decode or loads)(response.content) if response.status_code == 200 else None
+        throttled = is_throttled(response.status_code, body)
+        endpoint.record(time.monotonic() - start, response.status_code == 200 and not throttled)
+        limiter.record_response(response.status_code, body, response.headers.get("Retry-After"))
+        if response.status_code != 200 or (throttled and not isinstance(body, list)):
+            return response, None
+        return response, body
+
+    def post(self, payload, method: Optional[str] = None, count: int = 1,
+             decode=None) -> Tuple[Optional[requests.Response], Optional[object]]:
+        """
+        Send a JSON-RPC request (or batch) through the pool; returns (response, decoded body).
+
+        `decode` turns the response bytes into the body and defaults to plain JSON.
+        """
+        ranked = self.ranked()
+        if self.hedge_after is not None and method in self.hedge_methods and len(ranked) > 1:
+            return self._post_hedged(ranked, payload, method, count, decode)
+
+        response = None
+        for endpoint in ranked:
+            response, body = self._send(endpoint, payload, method, count, decode)
+            if body is not None:
+                return response, body
+        return response, None
+
+    def _post_hedged(self, ranked: List[EndpointStats], payload, method: str, count: int, decode=None):
+        primary = self._executor.submit(self._send, ranked[0], payload, method, count, decode)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done and primary.result()[1] is not None:
+            return primary.result()
+
+        # Slow or failed: race a duplicate on the next endpoint
+        self.hedged += 1
+        hedge = self._executor.submit(self._send, ranked[1], payload, method, count, decode)
+        pending = {primary, hedge}
+        response = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                response, body = future.result()
+                if body is not None:
+                    if future is hedge:
+                        self.hedge_wins += 1
+                    return response, body
+
+        # Both lost; fall back to the remaining endpoints in order
+        for endpoint in ranked[2:]:
+            response, body = self._send(endpoint, payload, method, count, decode)
+            if body is not None:
+                return response, body
+        return response, None
+
+    def record_throttled(self, response: requests.Response) -> None:
+        """
+        Charge a throttle to the endpoint that answered `response`.
+
+        For batches whose elements are decoded by the caller, which `_send`
+        only sees as raw bytes and can't check for -32005 errors.
+        """
+        url = response.url.rstrip("/")
+        for endpoint in self.endpoints:
+            if endpoint.url.rstrip("/") == url:
+                endpoint.record_error()
+                get_rate_limiter(endpoint.url).on_throttled()
+                return
+
+    def stats(self) -> List[dict]:
+        """Per-endpoint latency percentiles and error rates."""
+        return [
+            {
+                'url': e.url,
+                'requests': e.requests,
+                'errors': e.errors,
+                'error_rate': e.error_rate,
+                'p50': e.p50,
+                'p99': e.p99,
+            }
+            for e in self.endpoints
+        ]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -1,22 +1,119 @@
-# Global rate limit for RPC requests (in seconds)
-RATE_LIMIT = 0.2  # Adjust this value as needed
+# RPC endpoint used for transaction lookups and its request budget
+RPC_URL = "https://api.devnet.solana.com"
+RPC_REQUESTS_PER_SECOND = 5  # Adjust this value as needed
+
+# Programs main() watches: the major DEXes
+WATCHED_PROGRAMS = [
+    'srmqPvymJeFKQ4zGQed1GFppgkRHL9kaELCbyksJtPX',  # Serum DEX
+    '675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8',  # Raydium
+    'JUP4Fb2cqiRUcaTHdrPC8h2gNsA2ETXiPDD33WcGuJB',  # Jupiter
+    'whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc',  # Orca
+    '9W959DqEETiGZocYWCQPaJ6sBmUzgfxXfqGeTEdp3aQP',  # Raydium Swap
+]
 
 import websockets
 import json
 import asyncio
 import logging
 import requests
+from collections import OrderedDict
 from datetime import datetime
+from typing import List, Optional
 from websockets.exceptions import ConnectionClosed, WebSocketException
+from rate_limiter import configure_endpoint, get_rate_limiter
+from block_fetcher import BlockFetcher
+from message_queue import MessageQueue
+from rpc_pool import RpcPool
+from block_decoder import BlockDecoder
+from fast_json import loads
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stream modes: per-transaction logs, whole blocks pushed by blockSubscribe, or
+# slotSubscribe with blocks fetched over RPC for nodes without blockSubscribe
+STREAM_MODES = ("logs", "blocks", "slots")
+
+BLOCK_CONFIG = {
+    "encoding": "jsonParsed",
+    "transactionDetails": "full",
+    "maxSupportedTransactionVersion": 0,
+}
+
+# Recent signatures remembered to drop a transaction delivered by several program subscriptions
+DEDUPE_WINDOW = 10_000
+
 class SolanaStreamClient:
-    def __init__(self, websocket_url: str = "wss://api.mainnet-beta.solana.com"):
+    def __init__(self, websocket_url: str = "wss://api.mainnet-beta.solana.com", mode: str = "logs",
+                 rpc_url: str = RPC_URL, fetch_concurrency: int = 8, workers: int = 4,
+                 queue_size: int = 1000, overflow: str = "block", spill_path: str = None,
+                 metrics_interval: float = 30, program_ids: Optional[List[str]] = None,
+                 projection: Optional[str] = None):
+        if mode not in STREAM_MODES:
+            raise ValueError(f"Unknown stream mode {mode!r}, expected one of {STREAM_MODES}")
         self.ws_url = websocket_url
-        self.subscription_id = None
+        self.rpc_url = rpc_url
+        self.pool = rpc_url if isinstance(rpc_url, RpcPool) else None
+        self.mode = mode
+        self.program_ids = list(program_ids or [])
         self.connected = False
+        self.rate_limiter = None if self.pool else get_rate_limiter(rpc_url)
+        # Blocks and transactions are decoded straight into projected structs when a projection is given
+        self.decoder = BlockDecoder(projection) if projection else None
+
+        # Received messages are handed to a pool of workers through a bounded queue
+        self.queue = MessageQueue(queue_size, overflow, spill_path)
+        self.num_workers = workers
+        self.metrics_interval = metrics_interval
+        self.worker_tasks = []
+
+        # State for the slots fallback: blocks are fetched up to the latest root
+        self.block_fetcher = None
+        if mode == "slots":
+            self.block_fetcher = BlockFetcher(
+                rpc_url,
+                concurrency=fetch_concurrency,
+                block_config={**BLOCK_CONFIG, "rewards": False},
+                decoder=self.decoder,
+            )
+        self.latest_root = None
+        self.last_fetched_slot = None
+        self.root_advanced = asyncio.Event()
+        self.root_follower = None
+
+        # Subscriptions share one connection; notifications are routed by subscription id
+        self.subscriptions = []
+        self.handlers = {}
+        self.register_subscriptions()
+
+        # A transaction that mentions several watched programs is notified once per subscription
+        self.dedupe_signatures = mode != "slots" and len(self.program_ids) > 1
+        self.seen_signatures = OrderedDict()
+        self.duplicates = 0
+
+    def first_sighting(self, signature) -> bool:
+        """Remember a signature; False if it was already seen recently. Unsigned entries are never deduped"""
+        if signature is None:
+            return True
+        if signature in self.seen_signatures:
+            self.duplicates += 1
+            return False
+        self.seen_signatures[signature] = None
+        if len(self.seen_signatures) > DEDUPE_WINDOW:
+            self.seen_signatures.popitem(last=False)
+        return True
+
+    async def enqueue(self, message):
+        """Queue a received message, dropping transactions another subscription already delivered"""
+        if self.dedupe_signatures and self.mode == "logs":
+            try:
+                value = ((loads(message).get('params') or {}).get('result') or {}).get('value') or {}
+            except (ValueError, AttributeError):
+                value = {}  # left for the worker to report
+            signature = value.get('signature')
+            if signature and not self.first_sighting(signature):
+                return
+        await self.queue.put(message)
 
     async def connect_with_timeout(self):
         """Connect to WebSocket with timeout"""
@@ -34,38 +131,70 @@ class SolanaStreamClient:
             logger.error(f"Connection error: {e}")
             return None
 
-    async def subscribe_transactions(self, ws):
-        """Subscribe to transaction stream with timeout"""
+    def add_subscription(self, method, params, handler):
+        """Register a subscription; all of them are (re)established together on connect"""
+        self.subscriptions.append((method, params, handler))
+
+    def register_subscriptions(self):
+        """Register the subscriptions for the stream mode, one per watched program"""
+        if self.mode == "slots":
+            self.add_subscription("slotSubscribe", [], self.on_slot_update)
+            return
+
+        # Without program filters a single subscription covers the whole chain
+        program_ids = self.program_ids or [None]
+        if self.mode == "blocks":
+            config = {**BLOCK_CONFIG, "commitment": "confirmed", "showRewards": False}
+            for program_id in program_ids:
+                block_filter = {"mentionsAccountOrProgram": program_id} if program_id else "all"
+                self.add_subscription("blockSubscribe", [block_filter, config], self.process_block_notification)
+        else:
+            for program_id in program_ids:
+                # logsSubscribe only accepts a single pubkey per mentions filter
+                logs_filter = {"mentions": [program_id]} if program_id else "all"
+                self.add_subscription("logsSubscribe", [logs_filter, {"commitment": "confirmed"}],
+                                      self.process_logs_notification)
+
+    async def subscribe_all(self, ws):
+        """Send every registered subscription and map the returned ids to their handlers"""
+        self.handlers = {}
+        pending = {}
         try:
-            subscribe_msg = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "logsSubscribe",
-                "params": ["all"]
-            }
-            
-            await asyncio.wait_for(
-                ws.send(json.dumps(subscribe_msg)),
-                timeout=5
-            )
-            logger.info("Subscription request sent")
-            
-            # Wait for subscription confirmation
-            response = await asyncio.wait_for(
-                ws.recv(),
-                timeout=5
-            )
-            logger.info(f"Received response: {response}")
-            
-            response_data = json.loads(response)
-            if 'result' in response_data:
-                self.subscription_id = response_data['result']
-                logger.info(f"Successfully subscribed with ID: {self.subscription_id}")
-                return True
-            else:
-                logger.error(f"Subscription failed: {response_data}")
-                return False
-                
+            for request_id, (method, params, handler) in enumerate(self.subscriptions, start=1):
+                pending[request_id] = (method, handler)
+                subscribe_msg = {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "method": method,
+                    "params": params
+                }
+                await asyncio.wait_for(
+                    ws.send(json.dumps(subscribe_msg)),
+                    timeout=5
+                )
+            logger.info(f"Sent {len(pending)} subscription requests")
+
+            # Confirmations can interleave with notifications for subscriptions already made
+            while pending:
+                response = await asyncio.wait_for(
+                    ws.recv(),
+                    timeout=5
+                )
+                response_data = json.loads(response)
+                if response_data.get('id') not in pending:
+                    await self.enqueue(response)
+                    continue
+
+                method, handler = pending.pop(response_data['id'])
+                if 'result' in response_data:
+                    self.handlers[response_data['result']] = handler
+                    logger.info(f"{method} subscribed with ID: {response_data['result']}")
+                else:
+                    logger.error(f"{method} subscription failed: {response_data}")
+                    return False
+
+            return True
+
         except asyncio.TimeoutError:
             logger.error("Subscription timeout")
             return False
@@ -75,18 +204,26 @@ class SolanaStreamClient:
 
     async def fetch_transaction_details(self, signature):
         """Fetch transaction details using RPC."""
-        RPC_URL = "https://api.devnet.solana.com"
         payload = {
             "jsonrpc": "2.0",
             "id": 1,
-            "method": "getBlock",
-            "params": [signature, {"encoding": "jsonParsed"}]
+            "method": "getTransaction",
+            "params": [signature, {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}]
         }
+        decode = self.decoder.decode_transaction if self.decoder else json.loads
         try:
-            response = requests.post(RPC_URL, json=payload)
+            if self.pool:
+                _, data = await asyncio.to_thread(self.pool.post, payload, "getTransaction", 1, decode)
+                return data
+
+            # Run the blocking request off the event loop so the socket keeps being served
+            response = await asyncio.to_thread(requests.post, self.rpc_url, json=payload)
             if response.status_code == 200:
-                return response.json()
+                data = decode(response.content)
+                self.rate_limiter.record_response(response.status_code, data)
+                return data
             else:
+                self.rate_limiter.record_response(response.status_code, retry_after=response.headers.get("Retry-After"))
                 logger.error(f"Failed to fetch transaction details: {response.status_code}")
                 return None
         except Exception as e:
@@ -95,7 +232,8 @@ class SolanaStreamClient:
 
     async def fetch_transaction_details_with_rate_limit(self, signature):
         """Fetch transaction details with rate limit."""
-        await asyncio.sleep(RATE_LIMIT)  # Use global rate limit
+        if self.rate_limiter:
+            await self.rate_limiter.acquire_async("getTransaction")
         return await self.fetch_transaction_details(signature)
 
     def extract_sender_receiver(self, transaction_data):
@@ -151,49 +289,150 @@ class SolanaStreamClient:
 
         return details
 
+    async def process_block(self, slot, block):
+        """Process every transaction of a decoded block, without further RPC calls"""
+        transactions = block.get("transactions", [])
+        if self.dedupe_signatures:
+            # Blocks are only decoded by the workers, so overlapping block notifications are deduped here
+            transactions = [tx for tx in transactions
+                            if self.first_sighting((tx.get("transaction", {}).get("signatures") or [None])[0])]
+        print(f"\nBlock {slot}: {len(transactions)} transactions")
+
+        for tx in transactions:
+            transaction_data = {"result": tx}
+            signature = (tx.get("transaction", {}).get("signatures") or [None])[0]
+            sender, receiver = self.extract_sender_receiver(transaction_data)
+            details = self.extract_transaction_details(transaction_data)
+            error = tx.get("meta", {}).get("err")
+
+            print(f"Signature: {signature}")
+            print(f"Sender: {sender}  Receiver: {receiver}")
+            print(f"Instructions: {len(details['instructions'])}  Accounts: {len(details['accounts'])}")
+            print(f"Error: {error}" if error else "Transaction successful")
+
+        print("-" * 50)
+
+    async def follow_roots(self):
+        """Fetch every slot up to the latest root as slot notifications advance it"""
+        while True:
+            await self.root_advanced.wait()
+            self.root_advanced.clear()
+
+            start_slot = self.last_fetched_slot + 1
+            end_slot = self.latest_root
+            async for slot, response in self.block_fetcher.iter_blocks(start_slot, end_slot):
+                # Skipped slots come back as errors and simply have no block
+                block = response.get("result") if response else None
+                if block:
+                    await self.process_block(slot, block)
+                self.last_fetched_slot = slot
+
+    async def on_slot_update(self, result):
+        """Advance the fetch target from a slotNotification"""
+        root = result.get("root")
+        if root is None:
+            return
+        if self.last_fetched_slot is None:
+            self.last_fetched_slot = root
+            self.latest_root = root
+        elif root > self.latest_root:
+            self.latest_root = root
+            self.root_advanced.set()
+
+        if self.root_follower is None or self.root_follower.done():
+            self.root_follower = asyncio.create_task(self.follow_roots())
+
+    async def process_block_notification(self, result):
+        """Handle a blockNotification"""
+        value = result.get('value', {})
+        if value.get('block'):
+            await self.process_block(value.get('slot'), value['block'])
+        elif value.get('err'):
+            logger.warning(f"Block notification error at slot {value.get('slot')}: {value['err']}")
+
+    async def process_logs_notification(self, result):
+        """Handle a logsNotification"""
+        value = result.get('value', {})
+        signature = value.get('signature', 'None')
+        slot = result.get('context', {}).get('slot', 'None')
+
+        print(f"\nTransaction detected:")
+        print(f"Signature: {signature}")
+        print(f"Slot: {slot}")
+
+        # Fetch transaction details using RPC
+        transaction_data = await self.fetch_transaction_details_with_rate_limit(signature)
+        if transaction_data:
+            sender, receiver = self.extract_sender_receiver(transaction_data)
+            print(f"Sender: {sender}")
+            print(f"Receiver: {receiver}")
+
+            # Extract additional details
+            details = self.extract_transaction_details(transaction_data)
+            print(f"Accounts: {details['accounts']}")
+            print(f"Instructions: {details['instructions']}")
+            print(f"Logs: {details['logs']}")
+            print(f"Balances: {details['balances']}")
+        else:
+            print("Failed to fetch transaction details")
+
+        # Check for errors
+        error = value.get('err', None)
+        if error:
+            print(f"Error: {error}")
+        else:
+            print("Transaction successful")
+
+        print("-" * 50)
+
     async def process_message(self, message):
-        """Process incoming message"""
+        """Route an incoming notification to the handler of its subscription"""
         try:
-            data = json.loads(message)
-
-            if 'params' in data and 'result' in data['params']:
-                result = data['params']['result']
-                value = result.get('value', {})
-                signature = value.get('signature', 'None')
-                slot = result.get('context', {}).get('slot', 'None')
-
-                print(f"\nTransaction detected:")
-                print(f"Signature: {signature}")
-                print(f"Slot: {slot}")
-
-                # Fetch transaction details using RPC
-                transaction_data = await self.fetch_transaction_details_with_rate_limit(signature)
-                if transaction_data:
-                    sender, receiver = self.extract_sender_receiver(transaction_data)
-                    print(f"Sender: {sender}")
-                    print(f"Receiver: {receiver}")
-
-                    # Extract additional details
-                    details = self.extract_transaction_details(transaction_data)
-                    print(f"Accounts: {details['accounts']}")
-                    print(f"Instructions: {details['instructions']}")
-                    print(f"Logs: {details['logs']}")
-                    print(f"Balances: {details['balances']}")
-                else:
-                    print("Failed to fetch transaction details")
-
-                # Check for errors
-                error = value.get('err', None)
-                if error:
-                    print(f"Error: {error}")
-                else:
-                    print("Transaction successful")
+            if self.mode == "blocks" and self.decoder:
+                data = self.decoder.decode_notification(message)
+            else:
+                data = json.loads(message)
+            params = data.get('params')
+            if not params or 'result' not in params:
+                return
 
-                print("-" * 50)
+            handler = self.handlers.get(params.get('subscription'))
+            if handler is None:
+                logger.debug(f"Notification for unknown subscription {params.get('subscription')}")
+                return
+            await handler(params['result'])
 
         except Exception as e:
             logger.error(f"Error processing message: {e}")
 
+    async def worker(self):
+        """Take messages off the queue and process them"""
+        while True:
+            message, _ = await self.queue.get()
+            try:
+                await self.process_message(message)
+            finally:
+                self.queue.task_done()
+
+    async def report_metrics(self):
+        """Periodically log queue depth and processing lag"""
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            stats = self.queue.stats()
+            logger.info(
+                f"Queue depth {stats['depth']} (max {stats['max_depth']}), "
+                f"processed {stats['processed']}/{stats['enqueued']}, "
+                f"dropped {stats['dropped']}, spilled {stats['spilled']}, duplicates {self.duplicates}, "
+                f"lag avg {stats['avg_lag']:.3f}s max {stats['max_lag']:.3f}s"
+            )
+
+    def start_workers(self):
+        """Start the worker pool and metrics reporter once; they outlive reconnects"""
+        if self.worker_tasks:
+            return
+        self.worker_tasks = [asyncio.create_task(self.worker()) for _ in range(self.num_workers)]
+        self.worker_tasks.append(asyncio.create_task(self.report_metrics()))
+
     async def listen_for_messages(self, ws):
         """Listen for messages with timeout"""
         while True:
@@ -202,7 +441,7 @@ class SolanaStreamClient:
                     ws.recv(),
                     timeout=30  # 30 second timeout for receiving messages
                 )
-                await self.process_message(message)
+                await self.enqueue(message)
             except asyncio.TimeoutError:
                 logger.warning("No messages received for 30 seconds")
                 # Send a ping to check connection
@@ -222,6 +461,7 @@ class SolanaStreamClient:
 
     async def start_streaming(self):
         """Main loop with reconnection logic"""
+        self.start_workers()
         while True:
             try:
                 # Connect to WebSocket
@@ -231,8 +471,8 @@ class SolanaStreamClient:
                     await asyncio.sleep(5)
                     continue
 
-                # Subscribe to transactions
-                subscribed = await self.subscribe_transactions(ws)
+                # Subscribe to transactions, blocks or slots
+                subscribed = await self.subscribe_all(ws)
                 if not subscribed:
                     logger.error("Failed to subscribe. Retrying in 5 seconds...")
                     await ws.close()
@@ -252,8 +492,14 @@ class SolanaStreamClient:
 async def main():
     # You can replace this with a different RPC endpoint
     ws_url = "wss://api.devnet.solana.com"
+    configure_endpoint(RPC_URL, RPC_REQUESTS_PER_SECOND)
     
-    client = SolanaStreamClient(ws_url)
+    # "blocks" needs a node with blockSubscribe enabled; "slots" works anywhere
+    stream_mode = "logs"
+
+    # Only watch the DEX programs rather than every transaction on the chain
+    client = SolanaStreamClient(ws_url, mode=stream_mode, workers=8, overflow="drop-oldest",
+                                program_ids=WATCHED_PROGRAMS, projection="full")
     
     try:
         print("Starting Solana transaction stream...")
@@ -0,0 +1,186 @@
+"""
+RpcPool and RateLimiter against local stub JSON-RPC servers.
+
+Run from this directory with `python -m unittest test_rpc_pool`.
+"""
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from block_decoder import BlockDecoder
+from block_fetcher import BlockFetcher
+from rate_limiter import RateLimiter, configure_endpoint, get_rate_limiter
+from rpc_pool import RpcPool
+
+
+class StubRpc:
+    """
+    A local JSON-RPC endpoint answering getBlock with {"slot": n}.
+
+    `status` forces an HTTP status, `delay` holds every answer back, and
+    `throttled` lists slots answered with a -32005 error.
+    """
+
+    def __init__(self, status: int = 200, delay: float = 0.0, throttled=()):
+        self.status = status
+        self.delay = delay
+        self.throttled = set(throttled)
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests += 1
+                time.sleep(stub.delay)
+                body = [stub.answer(item) for item in payload] if isinstance(payload, list) else stub.answer(payload)
+                data = json.dumps(body).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        configure_endpoint(self.url, 1000)
+
+    def answer(self, item: dict) -> dict:
+        slot = item["params"][0]
+        if slot in self.throttled:
+            return {"jsonrpc": "2.0", "id": item["id"], "error": {"code": -32005, "message": "Too many requests"}}
+        return {"jsonrpc": "2.0", "id": item["id"], "result": {"slot": slot}}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def get_block(slot: int, request_id: int = 1) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "method": "getBlock", "params": [slot]}
+
+
+class RpcPoolTest(unittest.TestCase):
+    def stub(self, **kwargs) -> StubRpc:
+        stub = StubRpc(**kwargs)
+        self.addCleanup(stub.close)
+        return stub
+
+    def pool(self, stubs, **kwargs) -> RpcPool:
+        pool = RpcPool([stub.url for stub in stubs], explore_every=0, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_fails_over_on_http_errors(self):
+        broken, healthy = self.stub(status=500), self.stub()
+        pool = self.pool([broken, healthy])
+
+        _, body = pool.post(get_block(7), "getBlock")
+
+        self.assertEqual(body["result"], {"slot": 7})
+        stats = {s["url"]: s for s in pool.stats()}
+        self.assertEqual(stats[broken.url]["errors"], 1)
+        self.assertEqual(stats[healthy.url]["errors"], 0)
+
+    def test_routes_away_from_failing_endpoint(self):
+        broken, healthy = self.stub(status=500), self.stub()
+        pool = self.pool([broken, healthy])
+
+        for slot in range(5):
+            pool.post(get_block(slot), "getBlock")
+
+        self.assertEqual(pool.ranked()[0].url, healthy.url)
+        self.assertEqual(broken.requests, 1)
+
+    def test_throttled_call_fails_over_and_backs_off(self):
+        throttling, healthy = self.stub(throttled={7}), self.stub()
+        pool = self.pool([throttling, healthy])
+
+        _, body = pool.post(get_block(7), "getBlock")
+
+        self.assertEqual(body["result"], {"slot": 7})
+        limiter = get_rate_limiter(throttling.url)
+        self.assertEqual(limiter.throttled_count, 1)
+        self.assertLess(limiter.scale, 1.0)
+
+    def test_partly_throttled_batch_keeps_good_elements(self):
+        stub = self.stub(throttled={2})
+        pool = self.pool([stub])
+
+        _, body = pool.post([get_block(slot, slot) for slot in (1, 2, 3)], "getBlock", count=3)
+
+        by_id = {item["id"]: item for item in body}
+        self.assertEqual(by_id[1]["result"], {"slot": 1})
+        self.assertEqual(by_id[2]["error"]["code"], -32005)
+        self.assertEqual(by_id[3]["result"], {"slot": 3})
+
+    def test_decoded_batch_reports_throttles(self):
+        stub = self.stub(throttled={2})
+        pool = self.pool([stub])
+        fetcher = BlockFetcher(pool, batch_size=3, decoder=BlockDecoder())
+        self.addCleanup(fetcher.close)
+
+        results = fetcher._post_batch([1, 2, 3])
+
+        self.assertEqual(results[2][0]["error"]["code"], -32005)
+        self.assertEqual(get_rate_limiter(stub.url).throttled_count, 1)
+        self.assertEqual(pool.stats()[0]["errors"], 1)
+
+    def test_hedges_slow_calls(self):
+        slow, fast = self.stub(delay=0.5), self.stub()
+        pool = self.pool([slow, fast], hedge_after=0.05)
+
+        start = time.monotonic()
+        _, body = pool.post(get_block(7), "getBlock")
+
+        self.assertEqual(body["result"], {"slot": 7})
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual((pool.hedged, pool.hedge_wins), (1, 1))
+
+    def test_does_not_hedge_other_methods(self):
+        slow, fast = self.stub(delay=0.2), self.stub()
+        pool = self.pool([slow, fast], hedge_after=0.05)
+
+        pool.post(get_block(7), "getTransaction")
+
+        self.assertEqual(pool.hedged, 0)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_throttling_halves_rate_and_recovers(self):
+        limiter = RateLimiter(100, recovery_step=0.25)
+
+        self.assertTrue(limiter.record_response(429))
+        self.assertEqual(limiter.scale, 0.5)
+        limiter.record_response(200, {"result": 1})
+        limiter.record_response(200, {"result": 1})
+        self.assertEqual(limiter.scale, 1.0)
+
+    def test_retry_after_pauses_callers(self):
+        limiter = RateLimiter(1000)
+        limiter.record_response(429, retry_after="1")
+
+        start = time.monotonic()
+        limiter.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.9)
+
+    def test_bucket_paces_requests(self):
+        limiter = RateLimiter(20)
+
+        start = time.monotonic()
+        for _ in range(30):
+            limiter.acquire()
+
+        # The first 20 go out as a burst, the next 10 at 20 per second
+        self.assertGreaterEqual(time.monotonic() - start, 0.45)
+
+
+if __name__ == "__main__":
+    unittest.main()
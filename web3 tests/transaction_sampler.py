@@ -1,32 +1,31 @@
 import asyncio
 import json
 import logging
-import requests
+from typing import Dict, List, Optional
+from block_fetcher import BlockFetcher
+from fetch_profiles import get_profile, resolve_profile
+from instruction_decoder import decode_block
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SolanaTransactionSampler:
-    def __init__(self, rpc_url: str = "https://api.mainnet-beta.solana.com"):
+    REQUIRED_FIELDS = {"signatures", "accountKeys", "instructions", "err", "balances", "logs"}
+
+    def __init__(self, rpc_url: str = "https://api.mainnet-beta.solana.com", batch_size: int = 5, cache=None,
+                 profile: Optional[str] = None):
         self.rpc_url = rpc_url
+        self.batch_size = batch_size
+        self.profile = get_profile(profile) if profile else resolve_profile(self)
+        self.fetcher = BlockFetcher(rpc_url, batch_size=batch_size, cache=cache, block_config=self.profile.block_config)
 
     def fetch_block(self, slot: int):
         """Fetch a block by its slot number."""
-        payload = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "getBlock",
-            "params": [
-                slot,
-                {"transactionDetails": "full", "rewards": False}
-            ]
-        }
-        response = requests.post(self.rpc_url, json=payload)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            logger.error(f"Failed to fetch block {slot}: {response.status_code}")
-            return None
+        return self.fetcher.fetch_block_sync(slot)
+
+    def fetch_blocks(self, slots: List[int]) -> Dict[int, Optional[dict]]:
+        """Fetch several blocks in a single JSON-RPC batch request."""
+        return self.fetcher.fetch_blocks_sync(slots)
 
     async def sample_transactions(self, start_slot: int, sample_size: int = 20):
         """Fetch transactions from blocks starting at `start_slot` until `sample_size` is reached."""
@@ -34,22 +33,24 @@ class SolanaTransactionSampler:
         current_slot = start_slot
 
         while len(transactions) < sample_size:
-            logger.info(f"Fetching block {current_slot}")
-            block_data = self.fetch_block(current_slot)
+            slots = list(range(current_slot, current_slot + self.batch_size))
+            logger.info(f"Fetching blocks {slots[0]}-{slots[-1]}")
+            blocks = await self.fetcher.fetch_blocks(slots)
 
-            if not block_data or not block_data.get("result"):
-                logger.warning(f"No data for block {current_slot}")
-                current_slot += 1
-                continue
+            for slot in slots:
+                block_data = blocks.get(slot)
+                if not block_data or not block_data.get("result"):
+                    logger.warning(f"No data for block {slot}")
+                    continue
 
-            block_transactions = block_data.get("result", {}).get("transactions", [])
-            transactions.extend(block_transactions)
+                block_transactions = decode_block(block_data["result"]).get("transactions", [])
+                transactions.extend(block_transactions)
 
-            # Stop if we've reached the desired sample size
-            if len(transactions) >= sample_size:
-                break
+                # Stop if we've reached the desired sample size
+                if len(transactions) >= sample_size:
+                    break
 
-            current_slot += 1
+            current_slot += self.batch_size
 
         # Limit to the sample size
         transactions = transactions[:sample_size]
@@ -66,7 +67,7 @@ class SolanaTransactionSampler:
             instructions = message.get("instructions", [])
             for instr_idx, instr in enumerate(instructions, start=1):
                 logger.info(f"Instruction {instr_idx}:")
-                logger.info("  Program ID Index: %s", instr.get("programIdIndex"))
+                logger.info("  Program: %s", instr.get("programId", instr.get("programIdIndex")))
                 logger.info("  Accounts: %s", instr.get("accounts", []))
                 logger.info("  Data: %s", instr.get("data"))
 